@@ -0,0 +1,51 @@
+from kivy.uix.label import Label
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+
+
+class ProfilerOverlay(Label):
+    """
+    A toggleable text panel showing a FrameProfiler's rolling per-stage frame
+    timings, and the state of a QualityGovernor if given one.
+    """
+
+    def __init__(self, profiler, refresh_interval=0.5, governor=None, **kwargs):
+        self.profiler = profiler
+        self.governor = governor
+        self.refresh_interval = refresh_interval  # Seconds between text updates, to avoid re-rendering every frame
+        self.refresh_event = None
+        super().__init__(font_name="RobotoMono-Regular", font_size=12, halign="left", valign="top", **kwargs)
+        self.opacity = 0  # Initially hidden
+
+        # Add a translucent background behind the text
+        with self.canvas.before:
+            self.bg_color = Color(0, 0, 0, 0.6)
+            self.bg_rect = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._update_background, size=self._update_background)
+
+    def _update_background(self, *args):
+        """Keep the background and text box matched to the widget."""
+        self.bg_rect.pos = self.pos
+        self.bg_rect.size = self.size
+        self.text_size = self.size
+
+    @property
+    def is_visible(self):
+        return self.refresh_event is not None
+
+    def toggle_visibility(self):
+        """Show or hide the overlay; it only refreshes while visible."""
+        if self.is_visible:
+            self.refresh_event.cancel()
+            self.refresh_event = None
+            self.opacity = 0
+        else:
+            self.refresh()
+            self.refresh_event = Clock.schedule_interval(self.refresh, self.refresh_interval)
+            self.opacity = 1
+
+    def refresh(self, *args):
+        text = self.profiler.report()
+        if self.governor is not None:
+            text += "\n" + self.governor.report()
+        self.text = text
@@ -0,0 +1,34 @@
+from kivy.uix.widget import Widget
+from kivy.clock import Clock
+from kivy.graphics import Color, Line
+import numpy as np
+
+
+class Sparkline(Widget):
+    """A small line plot of one field's recent history in a Recorder, scaled to fit the widget."""
+
+    def __init__(self, recorder, field, color=(1, 1, 1, 0.8), max_points=200, refresh_interval=0.25, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+        self.field = field
+        self.max_points = max_points  # Longer histories are thinned out, keeping the newest sample
+        with self.canvas:
+            Color(*color)
+            self.line = Line(points=[], width=1)
+        # Redraw a few times per second rather than every frame
+        self.refresh_event = Clock.schedule_interval(self.refresh, refresh_interval)
+
+    def refresh(self, *args):
+        values = self.recorder.column(self.field)
+        if len(values) > self.max_points:
+            stride = -(-len(values) // self.max_points)
+            values = values[::-1][::stride][::-1]
+        if len(values) < 2:
+            self.line.points = []
+            return
+
+        low, high = values.min(), values.max()
+        span = high - low if high > low else 1.0
+        xs = np.linspace(self.x, self.right, len(values))
+        ys = self.y + (values - low) / span * self.height
+        self.line.points = np.column_stack((xs, ys)).ravel().tolist()
@@ -0,0 +1,250 @@
+"""
+Reproducible benchmark of the simulation step across particle counts.
+
+    python -m benchmark --output benchmark_results.json
+    python -m benchmark --counts 15 50 275 --min-time 0.2
+    python -m benchmark --counts 5000 20000 --workers 4
+    python -m benchmark --backend numpy
+    python -m benchmark --counts 10000 --integrators verlet --compare-workers 2 4
+
+Every configuration starts from seeded random initial conditions at the
+density of the Solid preset, and reports the mean time per step spent in each
+stage (force reset, spring, neighbors, collision, lennard-jones, integrate,
+render-sync). A power law is fitted to the step time of each series to track
+how it scales with the particle count. With --compare-workers, the step is
+also timed with the pair stage split across worker processes, and the
+speedup over running it in-process is reported.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+from bond_table import BondTable
+import integrators
+import kernels
+from parallel_forces import ParallelForceBackend
+from particle_system import ParticleSystem
+from profiler import StageTimer
+import presets
+
+default_counts = [15, 50, 275, 1000, 5000, 20000]
+
+# Reference box of the kiosk game area, and its Solid preset density
+reference_size = (1536, 648)
+reference_count = 275
+spring_constant = 100.0
+spring_rest_length = 2.0
+
+
+def render_sync_function():
+    """
+    Return a function building the renderer's vertex buffers for a system, or
+    None when Kivy isn't installed.
+    """
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    try:
+        from molecule_renderer import MoleculeRenderer, arrow_vertices, circle_vertices, unit_circle
+    except ImportError:
+        return None
+
+    outline = unit_circle(MoleculeRenderer.circle_segments)
+
+    def render_sync(system):
+        system.update_colors()
+        return circle_vertices(system, outline), arrow_vertices(system)
+    return render_sync
+
+
+def build_system(count, seed, intermolecular_forces, bonds, integrator="verlet", backend=None):
+    """
+    Scatter `count` molecules on a jittered lattice in a box scaled to keep the
+    Solid preset's density, with random velocities. Bonded systems chain every
+    molecule to the next one.
+    """
+    rng = np.random.default_rng(seed)
+    area_scale = np.sqrt(count / reference_count)
+    width, height = reference_size[0] * area_scale, reference_size[1] * area_scale
+    radius = presets.molecule_radius(reference_size[0])
+
+    system = ParticleSystem(backend=backend)
+    system.set_bounds((0, 0), (width, height))
+    system.intermolecular_forces = intermolecular_forces
+    system.integrator = integrators.create(integrator)
+
+    columns = int(np.ceil(np.sqrt(count * width / height)))
+    rows = int(np.ceil(count / columns))
+    spacing = np.array([width / (columns + 1), height / (rows + 1)])
+    cells = np.stack(np.unravel_index(np.arange(count), (rows, columns))[::-1], axis=1)
+    positions = (cells + 1) * spacing + rng.uniform(-0.2, 0.2, (count, 2)) * spacing
+    velocities = rng.uniform(-50, 50, (count, 2))
+    for (x, y), (vx, vy) in zip(positions, velocities):
+        system.add_particle(x, y, vx, vy, radius)
+
+    if bonds:
+        chain = BondTable(count)
+        for i in range(count - 1):
+            chain.add(i, i + 1, spring_constant, spring_rest_length)
+        system.force_providers.append(lambda: chain.apply(system.positions, system.forces, system.spring_totals))
+    return system
+
+
+def measure(system, render_sync, min_steps, min_time, delta=1 / 60.0):
+    """Step the system until both `min_steps` and `min_time` are reached; return mean seconds per step by stage."""
+    timer = StageTimer()
+    system.timer = timer
+    system.step(delta)  # Warm up caches, the cell list and any JIT compilation
+    timer.reset()
+
+    steps = 0
+    start = time.perf_counter()
+    while steps < min_steps or time.perf_counter() - start < min_time:
+        system.step(delta)
+        if render_sync is not None:
+            with timer.stage("render-sync"):
+                render_sync(system)
+        steps += 1
+
+    stages = {name: total / steps for name, total in timer.totals.items()}
+    return steps, stages
+
+
+def scaling_exponent(counts, step_times):
+    """Slope of log(step time) against log(particle count), i.e. the k in time ~ N^k."""
+    if len(counts) < 2:
+        return None
+    return float(np.polyfit(np.log(counts), np.log(step_times), 1)[0])
+
+
+def run_suite(counts, seed=0, min_steps=3, min_time=0.5, workers=0, backend=None,
+              integrator_names=("verlet", "euler"), log=print):
+    render_sync = render_sync_function()
+    backend = kernels.load(backend).name
+    log(f"Kernel backend: {backend}")
+    parallel_backend = ParallelForceBackend(workers) if workers else None
+    results = []
+    for intermolecular_forces, bonds, integrator in itertools.product((True, False), (False, True), integrator_names):
+        for count in counts:
+            system = build_system(count, seed, intermolecular_forces, bonds, integrator, backend)
+            system.parallel_backend = parallel_backend
+            steps, stages = measure(system, render_sync, min_steps, min_time)
+            result = {
+                "particles": count,
+                "intermolecular_forces": intermolecular_forces,
+                "bonds": bonds,
+                "integrator": integrator,
+                "steps": steps,
+                "stage_seconds_per_step": stages,
+                "seconds_per_step": sum(stages.values()),
+            }
+            results.append(result)
+            log(f"{count:>6} particles  forces={'on ' if intermolecular_forces else 'off'}  "
+                f"bonds={'on ' if bonds else 'off'}  {result['integrator']:<10}  "
+                f"{1000 * result['seconds_per_step']:9.3f} ms/step  "
+                + "  ".join(f"{name} {1000 * value:.3f}" for name, value in stages.items()))
+
+    if parallel_backend is not None:
+        parallel_backend.close()
+
+    scaling = []
+    for key, group in itertools.groupby(results, key=lambda r: (r["intermolecular_forces"], r["bonds"], r["integrator"])):
+        group = list(group)
+        scaling.append({
+            "intermolecular_forces": key[0],
+            "bonds": key[1],
+            "integrator": key[2],
+            "exponent": scaling_exponent([r["particles"] for r in group], [r["seconds_per_step"] for r in group]),
+        })
+
+    return {
+        "metadata": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "render_sync": render_sync is not None,
+            "workers": workers,
+            "backend": backend,
+        },
+        "results": results,
+        "scaling": scaling,
+    }
+
+
+def parallel_speedup(counts, worker_counts, seed=0, min_steps=3, min_time=0.5, backend=None, log=print):
+    """
+    Time the step with forces on and no bonds, first in-process and then with
+    the pair stage split across each number of workers, and report the
+    speedup of each over the in-process run.
+    """
+    timings = {count: {} for count in counts}
+    for workers in [0, *worker_counts]:
+        parallel_backend = ParallelForceBackend(workers) if workers else None
+        for count in counts:
+            system = build_system(count, seed, True, False, backend=backend)
+            system.parallel_backend = parallel_backend
+            system.parallel_min_particles = 0
+            _, stages = measure(system, None, min_steps, min_time)
+            timings[count][workers] = sum(stages.values())
+        if parallel_backend is not None:
+            parallel_backend.close()
+
+    results = []
+    for count in counts:
+        serial = timings[count][0]
+        for workers in worker_counts:
+            result = {
+                "particles": count,
+                "workers": workers,
+                "cpus": os.cpu_count(),
+                "serial_seconds_per_step": serial,
+                "parallel_seconds_per_step": timings[count][workers],
+                "speedup": serial / timings[count][workers],
+            }
+            results.append(result)
+            log(f"{count:>6} particles  {workers} workers  {1000 * serial:9.3f} ms/step in-process  "
+                f"{1000 * result['parallel_seconds_per_step']:9.3f} ms/step parallel  speedup {result['speedup']:.2f}x")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation step across particle counts.")
+    parser.add_argument("--counts", type=int, nargs="+", default=default_counts)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-steps", type=int, default=3, help="Fewest steps measured per configuration")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Fewest seconds measured per configuration")
+    parser.add_argument("--backend", choices=sorted(kernels.backends), default=kernels.default_backend,
+                        help="Kernel backend for the inner loops")
+    parser.add_argument("--integrators", nargs="+", choices=sorted(integrators.integrators), default=["verlet", "euler"])
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for the pair stage of large systems (0 runs in-process)")
+    parser.add_argument("--compare-workers", type=int, nargs="+", default=[],
+                        help="Also time the pair stage across each of these numbers of workers against in-process")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_suite(args.counts, args.seed, args.min_steps, args.min_time, args.workers, args.backend, args.integrators)
+    for series in report["scaling"]:
+        if series["exponent"] is not None:
+            print(f"Scaling  forces={'on ' if series['intermolecular_forces'] else 'off'}  "
+                  f"bonds={'on ' if series['bonds'] else 'off'}  {series['integrator']:<10}  "
+                  f"time ~ N^{series['exponent']:.2f}")
+    if args.compare_workers:
+        report["parallel"] = parallel_speedup(args.counts, args.compare_workers, args.seed, args.min_steps,
+                                              args.min_time, args.backend)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+
+from forces import spring_forces
+
+
+class BondTable:
+    """
+    Springs between pairs of particle indices, stored as parallel arrays
+    (first, second, rest length, stiffness) so Hooke's law is evaluated for
+    every bond in one pass. Each bond is kept under its canonical ordering
+    (lower index first), so lookups, additions and removals are O(1)
+    regardless of which end is given first.
+    """
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self._first = np.zeros(capacity, dtype=np.int64)
+        self._second = np.zeros(capacity, dtype=np.int64)
+        self._rest_lengths = np.zeros(capacity)
+        self._stiffnesses = np.zeros(capacity)
+        self.rows = {}  # (lower index, higher index) -> row of that bond
+
+    @staticmethod
+    def key(particle1, particle2):
+        """Canonical (lower, higher) ordering of a pair."""
+        return (particle1, particle2) if particle1 < particle2 else (particle2, particle1)
+
+    # Views over the live rows of each array
+    @property
+    def first(self):
+        return self._first[:self.count]
+
+    @property
+    def second(self):
+        return self._second[:self.count]
+
+    @property
+    def rest_lengths(self):
+        return self._rest_lengths[:self.count]
+
+    @property
+    def stiffnesses(self):
+        return self._stiffnesses[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, pair):
+        return self.key(*pair) in self.rows
+
+    def __iter__(self):
+        """Iterate over the bonded pairs in canonical order."""
+        return iter(self.rows)
+
+    def _grow(self):
+        """Double the capacity of every per-bond array."""
+        capacity = max(2 * len(self._first), 1)
+        for name in ("_first", "_second", "_rest_lengths", "_stiffnesses"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, particle1, particle2, stiffness, rest_length):
+        """Bond two particles; return False if they are already bonded."""
+        key = self.key(particle1, particle2)
+        if key in self.rows:
+            return False
+        if self.count == len(self._first):
+            self._grow()
+        row = self.count
+        self.count += 1
+        self._first[row], self._second[row] = key
+        self._stiffnesses[row] = stiffness
+        self._rest_lengths[row] = rest_length
+        self.rows[key] = row
+        return True
+
+    def remove(self, particle1, particle2):
+        """Remove the bond between two particles; return False if there wasn't one."""
+        row = self.rows.pop(self.key(particle1, particle2), None)
+        if row is None:
+            return False
+
+        # Move the last bond into the freed row so the arrays stay contiguous
+        last = self.count - 1
+        if row != last:
+            for array in (self._first, self._second, self._rest_lengths, self._stiffnesses):
+                array[row] = array[last]
+            self.rows[(int(self._first[row]), int(self._second[row]))] = row
+        self.count = last
+        return True
+
+    def clear(self):
+        self.count = 0
+        self.rows.clear()
+
+    def copy(self):
+        table = BondTable(max(self.count, 1))
+        table.count = self.count
+        for name in ("_first", "_second", "_rest_lengths", "_stiffnesses"):
+            getattr(table, name)[:self.count] = getattr(self, name)[:self.count]
+        table.rows = dict(self.rows)
+        return table
+
+    def apply(self, positions, out, totals=None, box=None):
+        """Add every bond's spring force to `out`, and optionally its energy and virial to `totals`."""
+        return spring_forces(positions, self.first, self.second, self.stiffnesses, self.rest_lengths, out, totals,
+                             box)
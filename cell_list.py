@@ -0,0 +1,248 @@
+import numpy as np
+
+
+def ragged_arange(lengths):
+    """Concatenated aranges 0..n-1 for every n in `lengths`, built in one pass."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def local_ids(cells, shape):
+    """Linear id of each (column, row) counted from the grid's first cell; -1 off a grid of `shape`."""
+    inside = ((cells >= 0) & (cells < shape)).all(axis=1)
+    return np.where(inside, cells[:, 0] * shape[1] + cells[:, 1], -1)
+
+
+def occupied_index(cell_ids, shape, cells):
+    """Index into the ascending `cell_ids` of each (column, row), or -1 where that cell is empty or off the grid."""
+    ids = local_ids(cells, shape)
+    if not len(cell_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    index = np.minimum(np.searchsorted(cell_ids, ids), len(cell_ids) - 1)
+    return np.where((ids >= 0) & (cell_ids[index] == ids), index, -1)
+
+
+def bin_cells(ids):
+    """
+    Sort particles by the linear id of their cell.
+    :return: (cell_ids, order, starts): the ids of the occupied cells, ascending;
+             particle indices sorted by cell; and for the k-th occupied cell the
+             slice starts[k]:starts[k + 1] of `order` holding its particles.
+    """
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    first = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(ids) else np.empty(0, np.int64)
+    return sorted_ids[first], order, np.r_[first, len(ids)].astype(np.int64)
+
+
+def cell_pairs(order, starts, first_cells, second_cells):
+    """
+    Every particle pair between each cell pair (first_cells[k], second_cells[k]);
+    a cell paired with itself gives each pair of its particles once.
+    """
+    counts = np.diff(starts)
+    first_counts = counts[first_cells]
+    # Every particle slot of each first cell, then the slots of the partner cell it pairs with
+    pair_of_slot = np.repeat(np.arange(len(first_cells)), first_counts)
+    slots = starts[first_cells][pair_of_slot] + ragged_arange(first_counts)
+    same = (first_cells == second_cells)[pair_of_slot]
+    partner_starts = np.where(same, slots + 1, starts[second_cells][pair_of_slot])
+    partner_counts = starts[second_cells + 1][pair_of_slot] - partner_starts
+    first = np.repeat(slots, partner_counts)
+    second = np.repeat(partner_starts, partner_counts) + ragged_arange(partner_counts)
+    return order[first], order[second]
+
+
+def grid_pairs(cell_ids, order, starts, shape, periodic, column_range=None):
+    """
+    Every pair of particles binned by bin_cells that share a cell or sit in
+    neighbouring cells of a grid of `shape`, wrapping around its edges when
+    periodic, as two index arrays (first, second).
+    :param column_range: Optional (lowest, highest) column, counted from the
+                         grid's first, of the cells to start from.
+    """
+    occupied = np.arange(len(cell_ids))
+    cells = np.stack((cell_ids // shape[1], cell_ids % shape[1]), axis=1)
+    if column_range is not None:
+        in_range = (cells[:, 0] >= column_range[0]) & (cells[:, 0] <= column_range[1])
+        occupied, cells = occupied[in_range], cells[in_range]
+
+    first_cells = [occupied]
+    second_cells = [occupied]
+    for offset in CellList.neighbour_offsets:
+        neighbours = cells + offset
+        if periodic:
+            neighbours %= shape
+        neighbours = occupied_index(cell_ids, shape, neighbours)
+        keep = neighbours >= 0
+        first_cells.append(occupied[keep])
+        second_cells.append(neighbours[keep])
+    first_cells = np.concatenate(first_cells)
+    second_cells = np.concatenate(second_cells)
+
+    if periodic and min(shape) < 3:
+        # Wrapped offsets can reach a cell itself, or the same neighbour from both sides; keep each pair once
+        distinct = np.r_[np.ones(len(occupied), dtype=bool), first_cells[len(occupied):] != second_cells[len(occupied):]]
+        first_cells, second_cells = first_cells[distinct], second_cells[distinct]
+        keys = np.minimum(first_cells, second_cells) * len(cell_ids) + np.maximum(first_cells, second_cells)
+        unique = np.sort(np.unique(keys, return_index=True)[1])
+        first_cells, second_cells = first_cells[unique], second_cells[unique]
+
+    return cell_pairs(order, starts, first_cells, second_cells)
+
+
+class CellList:
+    """
+    Uniform grid that buckets particles by their centre so that neighbour
+    searches only look at the surrounding cells instead of every particle.
+
+    The buckets are arrays, not Python lists: the sorted linear ids of the
+    occupied cells, particle indices sorted by cell, and each cell's slice of
+    that order, so binning and pair generation are a handful of whole-array
+    operations however many cells there are. Only occupied cells are stored,
+    so a stray particle far outside the box costs nothing.
+
+    Given a periodic box, the grid tiles the box with a whole number of cells
+    at least cell_size across and wraps around its edges, so pairs() also
+    finds pairs that are neighbours across them. With fewer than three cells
+    along a side, wrapping makes some neighbouring cells the same cell;
+    each pair of cells is still visited only once.
+    """
+
+    # Half of the 3x3 stencil around a cell, so every pair of cells is visited once
+    neighbour_offsets = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, cell_size=1.0, kernels=None):
+        self.cell_size = cell_size
+        self.kernels = kernels  # Backend whose bin_cells and grid_pairs do the work; None for the NumPy ones here
+        self.particle_cells = np.empty((0, 2), dtype=np.int64)  # Cell each particle is stored in
+        self.box = None  # (pos, size) of the periodic box the grid wraps around, or None
+        # The grid the particles were binned into (its first cell, columns and rows) and the buckets
+        self.origin = np.zeros(2, dtype=np.int64)
+        self.shape = np.ones(2, dtype=np.int64)
+        self.cell_ids = np.empty(0, dtype=np.int64)  # Linear id of every occupied cell, ascending
+        self.order = np.empty(0, dtype=np.int64)  # Particle indices sorted by cell
+        self.starts = np.zeros(1, dtype=np.int64)  # Occupied cell k holds order[starts[k]:starts[k + 1]]
+
+    @property
+    def cell_counts(self):
+        """Columns and rows of cells tiling the periodic box."""
+        return np.maximum(np.floor(np.asarray(self.box[1]) / self.cell_size), 1).astype(np.int64)
+
+    def cells_of(self, positions):
+        """Return the (column, row) of the cell containing each position."""
+        if self.box is None:
+            return np.floor(np.asarray(positions) / self.cell_size).astype(np.int64)
+        pos, size = (np.asarray(corner, dtype=float) for corner in self.box)
+        counts = self.cell_counts
+        return np.floor((np.asarray(positions) - pos) / size * counts).astype(np.int64) % counts
+
+    def set_periodic_box(self, box_pos, box_size):
+        """Wrap the grid around the box at box_pos of box_size, or unwrap it when box_size is None."""
+        box = None if box_size is None else (tuple(box_pos), tuple(box_size))
+        if box != self.box:
+            self.box = box
+            self.clear()
+
+    def set_cell_size(self, cell_size):
+        """Change the cell size, dropping the current buckets if it actually changed."""
+        if cell_size != self.cell_size:
+            self.cell_size = cell_size
+            self.clear()
+
+    def clear(self):
+        self.particle_cells = np.empty((0, 2), dtype=np.int64)
+        self.cell_ids = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.starts = np.zeros(1, dtype=np.int64)
+
+
+    def update(self, positions):
+        """
+        Bring the grid in line with the particles' current positions. Nothing
+        is redone when no particle changed cell; otherwise the particles are
+        re-sorted by cell.
+        """
+        cells = self.cells_of(positions)
+        if len(cells) == len(self.particle_cells) and np.array_equal(cells, self.particle_cells):
+            return
+        self.particle_cells = cells
+        if self.box is not None:
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.shape = self.cell_counts
+        elif len(cells):
+            self.origin = cells.min(axis=0)
+            self.shape = cells.max(axis=0) - self.origin + 1
+        binning = bin_cells if self.kernels is None else self.kernels.bin_cells
+        self.cell_ids, self.order, self.starts = binning(local_ids(cells - self.origin, self.shape))
+
+    def neighbour_cells(self, cells, offset):
+        """Occupied-cell index of the cell at `offset` from each (column, row), wrapped in a periodic box, or -1."""
+        neighbours = cells - self.origin + offset
+        if self.box is not None:
+            neighbours %= self.shape
+        return occupied_index(self.cell_ids, self.shape, neighbours)
+
+    def nearest(self, positions, points, reach):
+        """
+        For each of the (M, 2) `points`, the index of the nearest particle whose
+        centre is within `reach`, or -1. Only the cells that can hold such a
+        centre are searched, so each query costs O(1) at bounded density.
+        :param positions: The positions the grid was last updated with.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        nearest = np.full(len(points), -1, dtype=np.int64)
+        if not len(self.order) or not len(points):
+            return nearest
+        span = int(np.ceil(reach / self.cell_size))
+        point_cells = self.cells_of(points)
+
+        # Every (point, cell within span) with the cell's slice of the sorted particles
+        query_points = []
+        query_cells = []
+        for column in range(-span, span + 1):
+            for row in range(-span, span + 1):
+                query_points.append(np.arange(len(points)))
+                query_cells.append(self.neighbour_cells(point_cells, (column, row)))
+        query_points = np.concatenate(query_points)
+        query_cells = np.concatenate(query_cells)
+        on_grid = query_cells >= 0
+        query_points, query_cells = query_points[on_grid], query_cells[on_grid]
+        if self.box is not None:
+            # A span wider than the box reaches the same cell more than once
+            unique = np.unique(query_points * len(self.cell_ids) + query_cells, return_index=True)[1]
+            query_points, query_cells = query_points[unique], query_cells[unique]
+        counts = self.starts[query_cells + 1] - self.starts[query_cells]
+        candidate_points = np.repeat(query_points, counts)
+        candidates = self.order[np.repeat(self.starts[query_cells], counts) + ragged_arange(counts)]
+        if not len(candidates):
+            return nearest
+
+        offsets = positions[candidates] - points[candidate_points]
+        squared = np.einsum("ij,ij->i", offsets, offsets)
+        within = squared <= reach * reach
+        if not within.any():
+            return nearest
+        candidate_points, candidates, squared = candidate_points[within], candidates[within], squared[within]
+        # Closest candidate of each point: sort by point, then distance, and take each point's first
+        by_point = np.lexsort((squared, candidate_points))
+        candidate_points, candidates = candidate_points[by_point], candidates[by_point]
+        first = np.flatnonzero(np.r_[True, candidate_points[1:] != candidate_points[:-1]])
+        nearest[candidate_points[first]] = candidates[first]
+        return nearest
+
+    def pairs(self, column_range=None):
+        """
+        Return two index arrays (first, second) listing every pair of particles
+        that share a cell or sit in neighbouring cells.
+        :param column_range: Optional (lowest, highest) column of the cells to
+                             start from; the pairs then include at least every
+                             pair with a particle strictly inside that range.
+        """
+        if column_range is not None:
+            column_range = (column_range[0] - self.origin[0], column_range[1] - self.origin[0])
+        pairing = grid_pairs if self.kernels is None else self.kernels.grid_pairs
+        return pairing(self.cell_ids, self.order, self.starts, self.shape, self.box is not None, column_range)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from forces import minimum_image
+
+
+def find_collisions(positions, radii, first, second, box=None):
+    """
+    Keep only the candidate pairs whose circles overlap.
+    :param box: Size of a periodic box, to measure each pair to its nearest image; None for walls.
+    :return: (first, second, offsets, distances) for the overlapping pairs, where
+             offsets point from the second particle to the first.
+    """
+    offsets = minimum_image(positions[first] - positions[second], box)
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    # Coincident centres have no collision normal, so they are left alone
+    overlapping = (distances <= radii[first] + radii[second]) & (distances > 0)
+    return first[overlapping], second[overlapping], offsets[overlapping], distances[overlapping]
+
+
+def resolve_collisions(positions, velocities, radii, first, second, separate=False,
+                       velocity_out=None, position_out=None, box=None):
+    """
+    Resolve every overlapping pair at once using basic 2D collision mechanics.
+
+    Each pair exchanges momentum along its collision normal, with the radius
+    standing in for mass, and keeps its tangential velocity. A particle touching
+    several others receives the sum of the impulses from each of its collisions.
+    :param separate: Also push overlapping pairs apart so they don't collide again next step.
+    :param velocity_out, position_out: Arrays the velocity / position changes are added to
+                                       instead of updating `velocities` and `positions` in place.
+    :param box: Size of a periodic box, so pairs collide across its edges; None for walls.
+    :return: Indices of every particle that took part in a collision.
+    """
+    first, second, offsets, distances = find_collisions(positions, radii, first, second, box)
+    if len(first) == 0:
+        return first
+
+    if velocity_out is None:
+        velocity_out = velocities
+    if position_out is None:
+        position_out = positions
+
+    normals = offsets / distances[:, None]
+    m1 = radii[first]
+    m2 = radii[second]
+    total_mass = m1 + m2
+
+    v1n = (normals * velocities[first]).sum(axis=1)
+    v2n = (normals * velocities[second]).sum(axis=1)
+
+    # v1n_new - v1n == 2 m2 (v2n - v1n) / (m1 + m2), and the same impulse acts on the partner
+    # scaled by m1 instead of m2; the tangential components are untouched.
+    exchange = 2 * (v2n - v1n) / total_mass
+    impulses = normals * exchange[:, None]
+    accumulate_weighted(velocity_out, first, impulses * m2[:, None])
+    accumulate_weighted(velocity_out, second, -impulses * m1[:, None])
+
+    if separate:
+        # Split the overlap so the lighter particle moves further
+        overlap = radii[first] + radii[second] - distances
+        pushes = normals * (overlap / total_mass)[:, None]
+        accumulate_weighted(position_out, first, pushes * m2[:, None])
+        accumulate_weighted(position_out, second, -pushes * m1[:, None])
+
+    return np.unique(np.concatenate((first, second)))
+
+
+def accumulate_weighted(values, indices, deltas):
+    """Add per-pair deltas onto the rows named by indices, summing repeated rows."""
+    count = len(values)
+    for axis in range(values.shape[1]):
+        values[:, axis] += np.bincount(indices, deltas[:, axis], minlength=count)
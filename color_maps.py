@@ -0,0 +1,122 @@
+"""
+Colour maps from a per-particle quantity to RGBA. Each map precomputes a
+256-entry lookup table blending between two colours, so colouring a frame
+is one vectorized pass: scale every particle's quantity to a table index and
+gather its row from the table, straight into the caller's colour buffer.
+
+A map reads its quantity from anything with ParticleSystem's per-particle
+arrays and saturation scales, so it works on a live system or a snapshot.
+"""
+import numpy as np
+
+table_size = 256
+default_low_color = (5, 0, 102, 255)
+default_high_color = (255, 81, 220, 255)
+
+
+def lookup_table(low_color, high_color, curve=None, size=table_size):
+    """
+    (size, 4) float32 table blending from low_color to high_color (0-255 RGBA).
+    :param curve: Maps each entry's position in [0, 1] to its blend fraction; linear when None.
+    """
+    t = np.linspace(0, 1, size)
+    if curve is not None:
+        t = curve(t)
+    low = np.asarray(low_color, dtype=float) / 255
+    high = np.asarray(high_color, dtype=float) / 255
+    return (low + (high - low) * t[:, None]).astype(np.float32)
+
+
+class ColorMap:
+    """
+    Colours particles by a quantity through a lookup table. Subclasses give the
+    quantity and the range (low, high) spread over the table; values outside
+    it get the end colours.
+    """
+
+    name = None
+    curve = None  # Blend fraction for a position in the table, e.g. a square root to undo a squared quantity
+
+    def __init__(self, low_color=default_low_color, high_color=default_high_color):
+        self.table = lookup_table(low_color, high_color, self.curve)
+        self.indices = np.empty(0, dtype=np.intp)  # Reused every frame, grown as particles are added
+
+    def quantities(self, state):
+        raise NotImplementedError
+
+    def value_range(self, state):
+        raise NotImplementedError
+
+    def colors(self, state, out):
+        """Write every particle's colour into `out`, an (N, 4) array or a view into a vertex buffer."""
+        values = self.quantities(state)
+        low, high = self.value_range(state)
+        if len(self.indices) < len(values):
+            self.indices = np.empty(max(len(values), 2 * len(self.indices)), dtype=np.intp)
+        indices = self.indices[:len(values)]
+        # Round to the nearest entry; mode='clip' sends out-of-range values to the end entries
+        np.multiply(values - low, (table_size - 1) / (high - low), out=values)
+        values += 0.5
+        np.floor(values, out=values)
+        indices[:] = values
+        if out.dtype == self.table.dtype:
+            np.take(self.table, indices, axis=0, out=out, mode='clip')
+        else:
+            out[:] = np.take(self.table, indices, axis=0, mode='clip')
+        return out
+
+
+class SpeedColorMap(ColorMap):
+    """Colour by speed, from at rest to the speed cap. Indexed by squared speed, so no square roots per particle."""
+
+    name = "speed"
+    curve = staticmethod(np.sqrt)
+
+    def quantities(self, state):
+        return np.einsum("ij,ij->i", state.velocities, state.velocities)
+
+    def value_range(self, state):
+        return 0.0, state.speed_cap ** 2
+
+
+class ForceColorMap(ColorMap):
+    """Colour by the total force on each particle, up to the force cap, on a square-root scale of its magnitude."""
+
+    name = "force"
+    curve = staticmethod(lambda t: t ** 0.25)  # Entries are in squared force
+
+    def quantities(self, state):
+        return np.einsum("ij,ij->i", state.forces, state.forces)
+
+    def value_range(self, state):
+        return 0.0, state.force_cap ** 2
+
+
+class PotentialEnergyColorMap(ColorMap):
+    """
+    Colour by each particle's share of the Lennard-Jones potential energy,
+    from three pair-well depths below zero (deeply bound) to as far above
+    (pushed together). Needs the system's track_potential_energies on.
+    """
+
+    name = "potential"
+
+    def quantities(self, state):
+        return state.potential_energies.copy()
+
+    def value_range(self, state):
+        depth = 3 * max(state.well_depth, 1e-9)
+        return -depth, depth
+
+
+color_maps = {color_map.name: color_map for color_map in (SpeedColorMap, ForceColorMap, PotentialEnergyColorMap)}
+
+
+def create(name, low_color=default_low_color, high_color=default_high_color):
+    """
+    Return a new colour map of the named kind.
+    :raises ValueError: If no colour map has that name.
+    """
+    if name not in color_maps:
+        raise ValueError(f"Unknown colour map {name!r}; choose from {sorted(color_maps)}")
+    return color_maps[name](low_color, high_color)
@@ -0,0 +1,146 @@
+import numpy as np
+
+
+def all_pairs(count):
+    """Index arrays (first, second) for every pair of `count` particles, i.e. the full distance matrix."""
+    return np.triu_indices(count, 1)
+
+
+def minimum_image(offsets, box):
+    """
+    Replace each pair offset, in place, by the offset to the nearest periodic
+    image of the partner in a box of size `box`; leave them alone if box is None.
+    """
+    if box is not None:
+        offsets -= box * np.round(offsets / box)
+    return offsets
+
+
+def accumulate_pair_forces(forces, first, second, pair_forces):
+    """
+    Add each pair force to its first particle and subtract it from the second.
+    Uses bincount rather than np.add.at because it is much faster for large pair lists.
+    """
+    count = len(forces)
+    for axis in range(2):
+        forces[:, axis] += np.bincount(first, pair_forces[:, axis], minlength=count)
+        forces[:, axis] -= np.bincount(second, pair_forces[:, axis], minlength=count)
+    return forces
+
+
+def lennard_jones_magnitude(r, epsilon, sigma):
+    """
+    Lennard-Jones force magnitude at reduced distance r (positive is repulsive),
+    using the demo's own scaling: 1000 * epsilon * (2 (sigma/r)^12 - (sigma/r)^6) / r^2.
+    """
+    sr6 = (sigma / r) ** 6
+    return 1000 * epsilon * (2 * sr6 * sr6 - sr6) / r ** 2
+
+
+def lennard_jones_potential(r, epsilon, sigma):
+    """
+    Potential energy whose negative derivative is lennard_jones_magnitude:
+    1000 * epsilon * (2 sigma^12 / (13 r^13) - sigma^6 / (7 r^7)), in reduced distance units.
+    """
+    sr6 = (sigma / r) ** 6
+    return 1000 * epsilon * (2 * sr6 * sr6 / 13 - sr6 / 7) / r
+
+
+def lennard_jones_pair_energies(r, epsilon, sigma, cutoff=None, shifted=False):
+    """
+    Potential energy of each pair at reduced distance r, consistent with the
+    forces lennard_jones_forces applies: zero at the cutoff, and with the
+    linear term of the force shift when `shifted` is set.
+    """
+    energies = lennard_jones_potential(r, epsilon, sigma)
+    if cutoff is not None:
+        energies -= lennard_jones_potential(cutoff, epsilon, sigma)
+        if shifted:
+            energies += (r - cutoff) * lennard_jones_magnitude(cutoff, epsilon, sigma)
+    return energies
+
+
+def lennard_jones_forces(positions, first, second, epsilon, sigma, scale, cutoff=None, shifted=False, out=None,
+                         totals=None, box=None, energies=None):
+    """
+    Calculate the Lennard-Jones force on every particle from a list of candidate pairs.
+    :param positions: (N, 2) array of particle centres, in pixels.
+    :param first, second: Index arrays of the pairs to evaluate; pass None for all pairs.
+    :param epsilon: Depth of the potential well.
+    :param sigma: Distance at which the potential is zero.
+    :param scale: Pixels per unit of distance.
+    :param cutoff: Optional distance (in the same units as sigma) beyond which pairs are ignored.
+    :param shifted: Subtract the force at the cutoff so it goes smoothly to zero there
+                    (a force-shifted potential), instead of jumping when a pair crosses it.
+    :param out: Optional (N, 2) array the forces are added to.
+    :param totals: Optional 2-element array; the pairs' potential energy and virial
+                   (sum of r_ij . F_ij) are added to it, both in pixel units.
+    :param box: Size of a periodic box, to measure each pair to its nearest image; None for walls.
+    :param energies: Optional (N,) array each particle's half of its pairs' potential energy is added to.
+    :return: (N, 2) array of per-particle force sums.
+    """
+    if out is None:
+        out = np.zeros_like(positions, dtype=float)
+    if first is None:
+        first, second = all_pairs(len(positions))
+    if len(first) == 0:
+        return out
+
+    offsets = minimum_image(positions[first] - positions[second], box)
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    r = distances / scale
+
+    interacting = r > 0  # Avoid division by zero if the molecules are at the same position
+    if cutoff is not None:
+        interacting &= r <= cutoff
+    if not interacting.all():
+        first, second = first[interacting], second[interacting]
+        offsets, distances, r = offsets[interacting], distances[interacting], r[interacting]
+
+    magnitudes = lennard_jones_magnitude(r, epsilon, sigma)
+    if shifted and cutoff is not None:
+        magnitudes -= lennard_jones_magnitude(cutoff, epsilon, sigma)
+
+    if totals is not None or energies is not None:
+        # Forces act on pixel offsets, so energies are scaled from reduced units to pixels
+        pair_energies = scale * lennard_jones_pair_energies(r, epsilon, sigma, cutoff, shifted)
+        if totals is not None:
+            totals[0] += pair_energies.sum()
+            totals[1] += (distances * magnitudes).sum()
+        if energies is not None:
+            energies += np.bincount(first, 0.5 * pair_energies, minlength=len(energies))
+            energies += np.bincount(second, 0.5 * pair_energies, minlength=len(energies))
+
+    pair_forces = offsets * (magnitudes / distances)[:, None]
+    return accumulate_pair_forces(out, first, second, pair_forces)
+
+
+def spring_forces(positions, first, second, stiffness, rest_length, out, totals=None, box=None):
+    """
+    Apply Hooke's law spring forces to every bonded pair and add them to `out`.
+    :param first, second: Index arrays of the bonded particles.
+    :param stiffness, rest_length: Spring constant and rest length, either scalars or one per bond.
+    :param totals: Optional 2-element array the springs' potential energy and virial are added to.
+    :param box: Size of a periodic box, so bonds act across its edges; None for walls.
+    """
+    if len(first) == 0:
+        return out
+
+    # Vector from the first molecule of each bond to the second
+    offsets = minimum_image(positions[second] - positions[first], box)
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    stiffness = np.broadcast_to(stiffness, distances.shape)
+    rest_length = np.broadcast_to(rest_length, distances.shape)
+
+    stretched = distances > 0  # Coincident molecules have no direction to push along
+    if not stretched.all():
+        first, second, offsets, distances = first[stretched], second[stretched], offsets[stretched], distances[stretched]
+        stiffness, rest_length = stiffness[stretched], rest_length[stretched]
+
+    # Positive magnitudes pull the pair together
+    magnitudes = stiffness * (distances - rest_length)
+    if totals is not None:
+        totals[0] += 0.5 * (stiffness * (distances - rest_length) ** 2).sum()
+        totals[1] -= (distances * magnitudes).sum()  # A stretched spring pulls inwards
+    pair_forces = offsets * (magnitudes / distances)[:, None]
+    return accumulate_pair_forces(out, first, second, pair_forces)
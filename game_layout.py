@@ -1,15 +1,29 @@
 from kivy.uix.widget import Widget
 from kivy.clock import Clock
-from kivy.graphics import Color, Rectangle, Line
+from kivy.graphics import Color, Rectangle
 from kivy.properties import NumericProperty, BooleanProperty
-from kivy.vector import Vector
-from molecule import Molecule  # Import the Molecule class
+from particle_system import ParticleSystem
+from bond_table import BondTable
+from molecule_renderer import MoleculeRenderer
+from scheduler import FixedTimestepScheduler
+from physics_thread import PhysicsThread
+from observables import Observables
+from recorder import Recorder
+from trajectory import TrajectoryWriter, Replay
+import integrators
+import color_maps
+import presets
+import preset_library
+from profiler import FrameProfiler
+from parallel_forces import ParallelForceBackend
+from governor import QualityGovernor, Tier
 from kivy.core.window import Window
-from random import uniform, randint
+from kivy.logger import Logger
+from random import uniform
 import math
-
-import psutil
 import os
+import time
+
 import gc
 
 class GameLayout(Widget):
@@ -18,8 +32,21 @@ class GameLayout(Widget):
     sigma = NumericProperty(1.0)  # Lennard-Jones potential sigma
     spring_constant = 100.0
     spring_rest_length = 2.0
-    molecule_radius_ratio = 0.03
+    molecule_radius_ratio = presets.molecule_radius_ratio
     use_verlet = True
+    integrator = "verlet"  # Integrator used while use_verlet is on: verlet, leapfrog, rk4 or adaptive
+    frame_rate = 60.0  # Rendered frames per second; at speed 1 each frame advances the physics by delta
+    kernel_backend = None  # Backend for the physics inner loops (see kernels.backends); None picks the fastest installed
+    stats_rate = 4.0  # Stat label updates per second; each text change re-renders a texture
+    color_map = "speed"  # What molecule colours show: speed, force or potential (see color_maps.color_maps)
+    periodic = False  # Wrap molecules around the edges of the box instead of bouncing them off walls
+    # Worker processes for collisions and Lennard-Jones on large systems; 0 keeps them in-process. Workers are
+    # spawned, not forked, so they don't inherit the Kivy/GL state; they re-import the main module, which is why
+    # main.py only imports the app under its __main__ guard
+    force_workers = 0
+    frame_budget = 1 / 60.0  # Seconds of drawing plus physics per frame the quality governor holds to
+    degraded_stats_rate = 1.0  # Stat label updates per second while the governor has turned them down
+    max_substeps = 8  # Most physics steps the N and M keys can split each delta into
 
     def __init__(self, **kwargs):
         super(GameLayout, self).__init__(**kwargs)
@@ -28,8 +55,7 @@ class GameLayout(Widget):
             self.rect = Rectangle(pos=self.pos, size=self.size)
         self.bind(pos=self.update_rect, size=self.update_rect)
 
-        self.molecules = []  # List of all molecules in the game
-        self.bonds = {}  # Dictionary to store Line objects for each bond
+        self.bonds = BondTable()  # Bonded particle indices with their spring constants and rest lengths
         # print(self.molecule_radius)
         self.old_pos = self.pos[:]
         self.old_size = self.size[:]
@@ -38,12 +64,57 @@ class GameLayout(Widget):
         self.scale = 10 ** (2)
         self.gravity = 0  # Initialize gravity
         self.delta = 1 / 60.0  # Time step
-        self.selected_molecule = None  # Track the first selected molecule for bonding
+        self.speed_factor = 1.0  # Multiplier on how much simulated time passes per wall-clock second
+        self.substeps = 1  # Physics steps each delta is split into
+        self.selected_molecule = None  # Index of the first selected molecule for bonding
+        self.pending_touches = []  # (x, y) of touches since the last frame, hit-tested together in update()
         self.simulation_running = False  # Track if simulation is running
-        self.size_factor = 0.6
+        self.size_factor = presets.default_size_factor
         self.molecule_radius = self.size[0] * self.molecule_radius_ratio * self.size_factor # Radius of the molecule
         self.forces_visible = True
 
+        # Turns elapsed wall-clock time into a whole number of fixed physics steps
+        self.scheduler = FixedTimestepScheduler(substeps=self.substeps)
+
+        # Headless engine holding every molecule's state
+        self.system = ParticleSystem(backend=self.kernel_backend)
+        self.system.set_bounds(self.pos, self.size)
+        self.system.force_providers.append(self.apply_spring_force)
+        if self.force_workers:
+            self.system.parallel_backend = ParallelForceBackend(self.force_workers)
+        self.spring_bonds = BondTable()  # Copy of the bonds owned by the physics thread
+        self.trajectory_writer = None  # Streams every drawn frame to a trajectory file while recording
+        self.replay = None  # Plays a recorded trajectory instead of the live simulation while set
+
+        # The system and scheduler are stepped on their own thread and only changed through its command queue;
+        # the UI draws the latest snapshot it publishes
+        self.observables = Observables()
+        self.recorder = Recorder(Observables.fields)  # Every step's observables, for sparklines and export
+        self.physics = PhysicsThread(self.system, self.scheduler, self.observables, self.recorder)
+        self.state = self.physics.front
+        self.update_time_scale()
+        self.sync_system_parameters()
+        self.set_integrator(self.integrator)
+        self.renderer = MoleculeRenderer(self.canvas.after, self.state)
+        self.renderer.bonds = self.bonds
+        self.set_color_map(self.color_map)
+
+        # Per-stage frame timings, physics stages included; the overlay is attached by the screen that shows it
+        self.profiler = FrameProfiler()
+        self.profiler_overlay = None
+
+        # Turns quality down, tier by tier, while drawing plus physics takes longer than the frame budget
+        self.governor = QualityGovernor([
+            Tier("force arrows", self.degrade_force_arrows),
+            Tier("bond lines", self.degrade_bond_lines),
+            Tier("substeps", self.degrade_substeps, active=lambda: self.substeps > 1),
+            Tier("stats rate", self.degrade_stats_rate),
+            Tier("spawn cap", self.degrade_spawning),
+        ], budget=self.frame_budget, log=Logger.info)
+        self.spawn_cap = None  # Most molecules a touch may spawn up to, while the governor caps them
+        self.render_time = 0.0  # Seconds the last frame spent drawing
+        self.governed_busy_time = 0.0  # Physics thread's busy_time when the governor last looked
+
         # Variable to store the scheduled update event
         # self.update_event = None
         # Labels for stats
@@ -67,11 +138,22 @@ class GameLayout(Widget):
             'speed_increase': 'y',
             'speed_decrease': 'h',
             'size_increase' : 'u',
-            'size_decrease' : 'j'
+            'size_decrease' : 'j',
+            'profiler_toggle' : 'p',
+            'profiler_dump' : 'o',
+            'history_dump' : 'l',
+            'recording_toggle' : 'k',
+            'replay_toggle' : 'i',
+            'periodic_toggle' : 'b',
+            'color_map_cycle' : 'c',
+            'substeps_increase' : 'n',
+            'substeps_decrease' : 'm'
         }
 
-        # Schedule the update event
-        self.update_event = None
+        # Schedule the update event; it runs while paused too, to show molecules added or removed meanwhile
+        self.physics.start()
+        self.update_event = Clock.schedule_interval(self.update, 1 / self.frame_rate)
+        self.stats_event = Clock.schedule_interval(self.update_stats, 1 / self.stats_rate)
         self.setup_keyboard()
         
         Clock.schedule_interval(lambda dt: gc.collect(), 5)
@@ -113,29 +195,48 @@ class GameLayout(Widget):
             self.adjust_size(0.05)
         elif key == self.key_mapping['size_decrease']:
             self.adjust_size(-0.05)
+        elif key == self.key_mapping['profiler_toggle']:
+            if self.profiler_overlay:
+                self.profiler_overlay.toggle_visibility()
+        elif key == self.key_mapping['profiler_dump']:
+            self.dump_profile()
+        elif key == self.key_mapping['history_dump']:
+            self.dump_history()
+        elif key == self.key_mapping['recording_toggle']:
+            self.toggle_recording()
+        elif key == self.key_mapping['replay_toggle']:
+            self.toggle_replay()
+        elif key == self.key_mapping['periodic_toggle']:
+            self.toggle_periodic()
+        elif key == self.key_mapping['color_map_cycle']:
+            self.cycle_color_map()
+        elif key == self.key_mapping['substeps_increase']:
+            self.set_substeps(self.substeps + 1)
+        elif key == self.key_mapping['substeps_decrease']:
+            self.set_substeps(self.substeps - 1)
         return True
 
     def adjust_gravity(self, change):
         """Adjust gravity by a specified increment and update the slider."""
-        self.gravity = max(0, min(self.gravity + change, 10))
+        self.set_gravity(max(0, min(self.gravity + change, 10)))
         if self.gravity_slider:
             self.gravity_slider.value = self.gravity
 
     def adjust_epsilon(self, change):
         """Adjust epsilon by a specified increment and update the slider."""
-        self.epsilon = max(0, min(self.epsilon + change, 10))
+        self.set_epsilon(max(0, min(self.epsilon + change, 10)))
         if self.epsilon_slider:
             self.epsilon_slider.value = self.epsilon
 
     def adjust_sigma(self, change):
         """Adjust sigma by a specified increment and update the slider."""
-        self.sigma = max(0.1, min(self.sigma + change, 3))
+        self.set_sigma(max(0.1, min(self.sigma + change, 3)))
         if self.sigma_slider:
             self.sigma_slider.value = self.sigma
 
     def adjust_delta(self, change):
         """Adjust delta by a specified increment and update the slider."""
-        self.delta = max(1 / 600, min(self.delta + change, 1))
+        self.set_delta(max(1 / 600, min(self.delta + change, 1)))
         if self.delta_slider:
             self.delta_slider.value = self.delta
 
@@ -143,7 +244,7 @@ class GameLayout(Widget):
         """Adjust simulation speed factor by a specified increment and update the slider."""
         new_speed = max(0.1, min(self.speed_slider.value + change, 1)) if self.speed_slider else 1.0
 
-        # Update speed slider and reschedule with new interval
+        # Update speed slider and the simulated time rate
         if self.speed_slider:
             self.speed_slider.value = new_speed
         
@@ -155,63 +256,35 @@ class GameLayout(Widget):
         if self.size_slider:
             self.size_slider.value = self.size_factor
             
-        self.molecule_radius = self.size[0] * self.molecule_radius_ratio * self.size_factor
-        for molecule in self.molecules:
-            molecule.fix_radius(self.molecule_radius)
+        self.resize_molecules()
 
     def create_bond(self, molecule1, molecule2):
-        """Creates a bond between two molecules and a Line object to represent it."""
-        if (molecule1, molecule2) not in self.bonds and (molecule2, molecule1) not in self.bonds:
-
-            # Create a Line object for the bond
-            with self.canvas:
-                line = Line(points=[molecule1.center_x, molecule1.center_y, molecule2.center_x, molecule2.center_y], width=1)
-                # Store the line associated with this bond in bond_lines
-                self.bonds[(molecule1, molecule2)] = line
+        """Creates a bond between two molecules; the renderer draws it from the bond table."""
+        if self.bonds.add(molecule1, molecule2, self.spring_constant, self.spring_rest_length):
+            self.update_spring_bonds()
 
     def remove_bond(self, molecule1, molecule2):
-        """Removes a bond between two molecules and its associated Line object."""
-        if (molecule1, molecule2) in self.bonds:
-            bond = (molecule1, molecule2)
-        elif (molecule2, molecule1) in self.bonds:
-            bond = (molecule2, molecule1)
-        else:
+        """Removes the bond between two molecules, if there is one."""
+        if not self.bonds.remove(molecule1, molecule2):
             return False
-        
-        self.canvas.remove(self.bonds[bond])
-        del self.bonds[bond]
+        self.update_spring_bonds()
         return True
             
     def clear_bonds(self):
-        """Clears all bonds and removes bond lines from the canvas."""
-        for bond, line in self.bonds.items():
-            self.canvas.remove(line)
+        """Clears all bonds."""
         self.bonds.clear()
+        self.update_spring_bonds()
+
+    def update_spring_bonds(self):
+        """Hand a copy of the bond table to the physics thread."""
+        self.physics.submit(setattr, self, "spring_bonds", self.bonds.copy())
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_bonds(self.bonds)
 
-    def update_bond_lines(self):
-        """Update the positions of all bond lines."""
-        # Ensure the color is white when updating bond lines
-        with self.canvas:
-            Color(1, 1, 1, 1)  # Set the color to white
-            for bond in self.bonds:
-                line = self.bonds[bond]
-                line.points = [bond[0].center_x, bond[0].center_y, bond[1].center_x, bond[1].center_y]
-                
     def apply_spring_force(self):
         """Apply spring force to all bonded pairs of molecules."""
-        for molecule1, molecule2 in self.bonds:
-            # Vector between molecule1 and molecule2
-            r12 = Vector(molecule2.center_x - molecule1.center_x, molecule2.center_y - molecule1.center_y)
-            distance = r12.length()
-
-            # Calculate the spring force using Hooke's law
-            force_magnitude = -self.spring_constant * (distance - self.spring_rest_length)
-
-            if distance > 0:
-                force_vector = (force_magnitude / distance) * r12  # Normalize the force vector
-                # Apply the force to both molecules
-                molecule1.add_force(-force_vector)
-                molecule2.add_force(force_vector)
+        self.spring_bonds.apply(self.system.positions, self.system.forces, self.system.spring_totals,
+                                self.system.periodic_box)
 
     def update_rect(self, instance, value):
         # Store the current position and size before updating
@@ -231,39 +304,43 @@ class GameLayout(Widget):
         self.rect.pos = self.pos
         self.rect.size = self.size
         
-        self.molecule_radius = self.size[0] * self.molecule_radius_ratio * self.size_factor
         # Call the resize logic
         self.on_resize()
 
     def on_touch_down(self, touch):
-        # if self.is_safe_touch(touch):
-        #     self.spawn_molecule_at_touch(touch)
-        # return
-        """Handle touch events for creating bonds between two selected molecules."""
-        
-        selected_molecule = None
-
-        # Check if the touch is near any molecule
-        for molecule in self.molecules:
-            if Vector(touch.pos).distance(molecule.center) <= molecule.radius * 2:
-                selected_molecule = molecule
-                break
-
-        if selected_molecule:
-            if self.selected_molecule:
-                # First molecule selected
-                if not self.remove_bond(selected_molecule, self.selected_molecule):
-                    self.create_bond(selected_molecule, self.selected_molecule)
-                self.selected_molecule = None
+        """Queue the touch; every touch since the last frame is handled together in update()."""
+        if self.replay is not None:
+            return  # Replayed molecules aren't in the particle system
+        self.pending_touches.append((touch.x, touch.y))
+
+    def handle_touches(self):
+        """
+        Hit-test every queued touch with one spatial-index query on the latest
+        state, then handle them in order: a touch on a molecule selects it, or
+        bonds (or unbonds) it to the one already selected; a touch in empty
+        space spawns a new molecule there.
+        """
+        if not self.pending_touches:
+            return
+        touches, self.pending_touches = self.pending_touches, []
+        hits = self.state.particles_at(touches, self.molecule_radius * 2)
+
+        for (x, y), selected_molecule in zip(touches, hits.tolist()):
+            if selected_molecule >= 0:
+                if self.selected_molecule is not None:
+                    # First molecule selected
+                    if not self.remove_bond(selected_molecule, self.selected_molecule):
+                        self.create_bond(selected_molecule, self.selected_molecule)
+                    self.selected_molecule = None
+                else:
+                    self.selected_molecule = selected_molecule
             else:
-                self.selected_molecule = selected_molecule
-        else:
-            # If no molecule is selected, spawn a new molecule at the touch position
-            if self.is_safe_touch(touch):
-                self.spawn_molecule_at_touch(touch)
-            self.selected_molecule = None
+                # If no molecule is selected, spawn a new molecule at the touch position
+                if self.is_safe_touch(x, y):
+                    self.spawn_molecule_at_touch(x, y)
+                self.selected_molecule = None
 
-    def is_safe_touch(self, touch):
+    def is_safe_touch(self, x, y):
         """
         Check if the touch is within safe bounds to prevent the molecule from extending past the edges.
         """
@@ -271,14 +348,18 @@ class GameLayout(Widget):
         safe_margin_y = self.molecule_radius
 
         return (
-            self.pos[0] + safe_margin_x <= touch.x <= self.right - safe_margin_x and
-            self.pos[1] + safe_margin_y <= touch.y <= self.top - safe_margin_y
+            self.pos[0] + safe_margin_x <= x <= self.right - safe_margin_x and
+            self.pos[1] + safe_margin_y <= y <= self.top - safe_margin_y
         )
 
-    def spawn_molecule_at_touch(self, touch):
+    def spawn_molecule_at_touch(self, x, y):
         """
-        Spawn a molecule at the touch position with a random initial velocity.
+        Spawn a molecule at the touch position with a random initial velocity,
+        unless the quality governor has capped the number of molecules.
         """
+        if self.spawn_cap is not None and self.state.count >= self.spawn_cap:
+            return
+
         # Generate random angle
         angle = uniform(-math.pi, math.pi)
         
@@ -286,211 +367,314 @@ class GameLayout(Widget):
         vx = 300 * math.cos(angle)
         vy = 300 * math.sin(angle)
         
-        molecule = Molecule(molecule_center=(touch.pos[0] + 50 - self.molecule_radius, touch.pos[1] + 50 - self.molecule_radius), molecule_radius=self.molecule_radius, molecule_vx=vx, molecule_vy=vy,
-                    parent_pos=self.pos[:], parent_size=self.size[:], forces_visible=self.forces_visible)
-
-        molecule.update_color_based_on_speed()  # Ensure the color is updated based on initial speed
-        self.add_widget(molecule)
-        self.molecules.append(molecule)
+        self.create_molecule(x, y, vx, vy)
         
     def start_simulation(self):
-        """Start the simulation update loop."""
+        """Start advancing time on the physics thread."""
         if not self.simulation_running:
             self.simulation_running = True
-            self.update_event = Clock.schedule_interval(self.update, 1 / 60.0)  # Default speed at 60 FPS
+            self.profiler.restart_frame()
+            if self.replay is None:
+                self.physics.resume()
 
     def stop_simulation(self):
-        """Stop the simulation update loop."""
+        """Pause the physics thread; queued changes are still applied."""
         if self.simulation_running:
             self.simulation_running = False
-            if self.update_event is not None:
-                self.update_event.cancel()
-                self.update_event = None
+            self.physics.pause()
 
     def set_speed(self, speed_factor):
-        """Adjust the simulation speed by setting a new interval."""
-        if self.update_event is not None:
-            self.update_event.cancel()
-        
-        # Schedule with the new interval based on the speed factor
-        new_interval = (1 / 60.0) / speed_factor  # Adjust interval according to speed factor
-        self.update_event = Clock.schedule_interval(self.update, new_interval)
+        """Adjust the simulation speed; the frame rate stays the same, only simulated time per frame changes."""
+        self.speed_factor = speed_factor
+        self.update_time_scale()
+
+    def set_substeps(self, substeps):
+        """Split every delta into this many smaller physics steps, between 1 and max_substeps."""
+        self.substeps = max(1, min(int(substeps), self.max_substeps))
+        if not self.governor.degraded("substeps"):
+            self.physics.submit(setattr, self.scheduler, "substeps", self.substeps)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_parameters(substeps=self.substeps)
+
+    def update_time_scale(self):
+        """Simulated seconds per wall-clock second: one delta per frame at speed 1."""
+        self.physics.submit(setattr, self.scheduler, "frame_step", self.delta)
+        self.physics.submit(setattr, self.scheduler, "time_scale", self.speed_factor * self.delta * self.frame_rate)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_parameters(delta=self.delta, speed_factor=self.speed_factor)
         
     def set_size(self, size_factor):
         """Adjust the simulation speed by setting a new interval."""
         # Schedule with the new interval based on the speed factor
         self.size_factor = size_factor
-        self.molecule_radius = self.size[0] * self.molecule_radius_ratio * self.size_factor
-        for molecule in self.molecules:
-            molecule.fix_radius(self.molecule_radius)
+        self.resize_molecules()
+
+    def resize_molecules(self):
+        """
+        Recompute the molecule radius from the layout width and size factor.
+        Molecules are only touched when the radius actually changed.
+        """
+        radius = self.size[0] * self.molecule_radius_ratio * self.size_factor
+        if radius == self.molecule_radius:
+            return
+        self.molecule_radius = radius
+        self.physics.submit(self.apply_radius, radius)
+
+    def apply_radius(self, radius):
+        """Give every molecule the same radius; runs on the physics thread."""
+        self.system.radii[:] = radius
             
     def toggle_update_mode(self):
-        self.use_verlet = not self.use_verlet
+        self.set_integrator(integrators.Euler.name if self.use_verlet else self.integrator)
+
+    def set_integrator(self, name):
+        """Switch the physics to one of the integrators module's integrators, e.g. "adaptive" for large deltas."""
+        self.use_verlet = name != integrators.Euler.name
+        if self.use_verlet:
+            self.integrator = name  # Remembered so toggle_update_mode can come back to it
+        self.set_system_parameter("integrator", integrators.create(name))
+
+    def set_system_parameter(self, name, value):
+        """Queue a new value for one of the particle system's parameters."""
+        self.physics.submit(setattr, self.system, name, value)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_parameters(**{name: getattr(value, "name", value)})
+
+    def sync_system_parameters(self):
+        """Push the current slider/toggle values into the particle system."""
+        for name in ("gravity", "epsilon", "sigma", "scale", "intermolecular_forces", "use_verlet", "periodic"):
+            self.set_system_parameter(name, getattr(self, name))
 
     def update(self, dt):
         """
-        Update molecule positions, handle collisions, and update bonds.
+        Draw the newest state published by the physics thread, if there is
+        one, onto molecules and bonds. Physics never runs here, so a slow step
+        doesn't hold up the rest of the UI. While replaying, the next recorded
+        frame is drawn instead.
         """
-        total_energy = 0
-        temperature = 0
-        pressure = 0
-        for molecule in self.molecules:
-            molecule.reset_total_force()
-            molecule.add_force(Vector(0, -self.gravity))
-            
-        self.molecule_radius = self.size[0] * self.molecule_radius_ratio * self.size_factor
-        self.apply_spring_force()
-
-        for i in range(len(self.molecules)):
-            molecule1 = self.molecules[i]
-            molecule1.fix_radius(self.molecule_radius)
-            for j in range(i + 1, len(self.molecules)):
-                molecule2 = self.molecules[j]
-                if molecule1.collide_widget(molecule2):
-                    molecule1.resolve_collision(molecule2)
-                    molecule1.update_color_based_on_speed()
-                    molecule2.update_color_based_on_speed()
-                if self.intermolecular_forces:
-                    force = molecule1.lennard_jones_force(molecule2, self.epsilon, self.sigma, self.scale)
-                    # print(force, i, j)
-                    molecule1.add_force(force)
-                    molecule2.add_force(-force)
-                    
-            molecule1.update_force_arrow()
-            if self.use_verlet:
-                molecule1.speed_cap = 500
-                molecule1.move(self.delta)
-            else:
-                molecule1.speed_cap = 8
-                molecule1.move_nonVerlet()
-
-            # Calculate kinetic energy
-            kinetic_energy = 0.5 * (molecule1.total_velocity.length2())
-            total_energy += kinetic_energy
-            temperature += kinetic_energy  # Temperature proportional to kinetic energy
-
-            pressure += abs(molecule1.total_velocity.x) + abs(molecule1.total_velocity.y)  # Simplified pressure calculation
-
-        self.total_energy_label.text = f"Total Energy: {total_energy:.2f}"
-        self.temperature_label.text = f"Temperature: {(temperature / len(self.molecules)) if len(self.molecules) else 0:.2f}"
-        self.pressure_label.text = f"Pressure: {pressure:.2f}"
-        # Update bond lines after molecule movement
-        self.update_bond_lines()
-        # memMb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0/1024.0
-        # print ("%5.1f MByte" % (memMb))
-        
-        # # Get current process
-        # process = psutil.Process(os.getpid())
+        if self.replay is not None:
+            self.update_replay()
+            return
+        if self.simulation_running:
+            self.govern()
+        self.handle_touches()
+        if not self.physics.swap():
+            return
+        self.state = self.physics.front
+        self.renderer.system = self.state
+
+        profiler = self.profiler
+        profiler.add_stages(self.state.stage_times)  # Physics stepped for this frame, timed on its own thread
+        render_start = time.perf_counter()
+        with profiler.stage("update"):
+            with profiler.stage("render"):
+                self.renderer.update()
+        self.render_time = time.perf_counter() - render_start
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_frame(self.state, self.state.step_count, self.renderer.particle_colors)
+        if self.simulation_running:
+            profiler.end_frame()
+        else:
+            profiler.restart_frame()
 
-        # # Measure CPU usage of this process
-        # cpu_usage = process.cpu_percent(interval=0)
-        # print(f"Python Process CPU Usage: {cpu_usage}%")
-        
-        # process = psutil.Process()
-        # current_memory = process.memory_info().rss  # In bytes
-        # print(f"Current memory usage: {current_memory / (1024 * 1024)} MB")
-        
-        process = psutil.Process()
-        
-        # CPU Usage (Total system % and current process %)
-        # total_cpu = psutil.cpu_percent(interval=0)  # Total CPU usage across all cores
-        # process_cpu = process.cpu_percent(interval=0)  # This process CPU usage
+    def govern(self):
+        """Give the governor the last frame's cost: its drawing plus the physics stepped since the frame before."""
+        busy_time = self.physics.busy_time
+        self.governor.observe(self.render_time + busy_time - self.governed_busy_time)
+        self.governed_busy_time = busy_time
+        self.render_time = 0.0
+
+    def degrade_force_arrows(self, degraded):
+        self.renderer.forces_visible = self.forces_visible and not degraded
 
-        # RAM Usage (in MB)
-        # total_memory = psutil.virtual_memory().percent / (1024 * 1024)  # Total system RAM used
-        # process_memory = process.memory_info().rss / (1024 * 1024)  # This process RAM usage
+    def degrade_bond_lines(self, degraded):
+        self.renderer.bonds_visible = not degraded
 
-        # print(f"Total CPU Usage: {total_cpu:.2f}% | Total RAM Usage: {total_memory:.2f} MB")
-        # print(f"Process CPU Usage: {process_cpu:.2f}% | Process RAM Usage: {process_memory:.2f} MB")
+    def degrade_substeps(self, degraded):
+        """One physics step per delta while degraded, however many substeps were chosen."""
+        self.physics.submit(setattr, self.scheduler, "substeps", 1 if degraded else self.substeps)
+
+    def degrade_stats_rate(self, degraded):
+        self.stats_event.cancel()
+        rate = self.degraded_stats_rate if degraded else self.stats_rate
+        self.stats_event = Clock.schedule_interval(self.update_stats, 1 / rate)
+
+    def degrade_spawning(self, degraded):
+        """Stop touches adding molecules beyond the current count."""
+        self.spawn_cap = self.state.count if degraded else None
+
+    def update_stats(self, dt):
+        """
+        Show the running averages of the latest snapshot in the stat labels, at
+        stats_rate rather than every frame. Kinetic, Lennard-Jones and spring
+        energy make up the total; temperature is the mean kinetic energy per
+        molecule; pressure is the virial pressure, with the pressure measured
+        from wall impulses alongside.
+        """
+        averages = self.state.observables
+        if not averages:
+            return
+        with self.profiler.stage("stats"):
+            self.total_energy_label.text = f"Total Energy: {averages['total_energy']:.2f}"
+            self.temperature_label.text = f"Temperature: {averages['temperature']:.2f}"
+            self.pressure_label.text = (f"Pressure: {averages['virial_pressure']:.3g} "
+                                        f"(walls {averages['wall_pressure']:.3g})")
+
+    def dump_profile(self, path="frame_profile"):
+        """Write the recorded frame timings to <path>.csv and <path>.json, and the governor's to <path>_quality.json."""
+        self.profiler.dump_csv(path + ".csv")
+        self.profiler.dump_json(path + ".json")
+        self.governor.dump_json(path + "_quality.json")
+
+    def dump_history(self, path="observables"):
+        """Write the recorded observables to <path>.csv and <path>.npz."""
+        self.recorder.export_csv(path + ".csv")
+        self.recorder.export_npz(path + ".npz")
+
+    def toggle_recording(self, path="trajectory.mdtraj"):
+        """Start streaming the drawn frames, bonds and parameter changes to `path`, or stop."""
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.close()
+            self.trajectory_writer = None
+            return
+        self.trajectory_writer = TrajectoryWriter(path, self.pos, self.size, frame_interval=1 / self.frame_rate)
+        self.trajectory_writer.write_bonds(self.bonds)
+        self.trajectory_writer.write_parameters(
+            **{name: getattr(self, name) for name in ("gravity", "epsilon", "sigma", "intermolecular_forces",
+                                                       "integrator", "delta", "speed_factor", "substeps")})
+
+    def toggle_replay(self, path="trajectory.mdtraj"):
+        """
+        Loop the trajectory at `path` in place of the live simulation, which is
+        paused meanwhile, or go back to the live simulation. A missing or
+        unreadable file is logged and the live simulation carries on.
+        """
+        if self.replay is not None:
+            self.replay = None
+            self.state = self.physics.front
+            self.renderer.system = self.state
+            self.renderer.bonds = self.bonds
+            self.set_color_map(self.color_map)
+            self.renderer.update()
+            if self.simulation_running:
+                self.physics.resume()
+            return
+        if not os.path.exists(path):
+            Logger.warning(f"Replay: nothing recorded at {path} yet; press K to record")
+            return
+        try:
+            self.replay = Replay(path, self.pos, self.size)
+        except (OSError, ValueError) as error:
+            Logger.error(f"Replay: cannot read {path}: {error}")
+            return
+        self.renderer.color_map = None  # Draw the colours stored in the recording
+        self.physics.pause()
+
+    def update_replay(self):
+        state = self.replay.advance()
+        if state is None:
+            return
+        self.state = state
+        self.renderer.system = state
+        self.renderer.bonds = self.replay.bonds
+        with self.profiler.stage("update"):
+            with self.profiler.stage("render"):
+                self.renderer.update()
+        self.profiler.end_frame()
 
     def on_resize(self):
         # When the game layout is resized, rescale molecules' positions
-        for molecule in self.molecules:
-            molecule.rescale_position(self.pos[:], self.size[:])
-            molecule.fix_radius(self.molecule_radius)
+        self.resize_molecules()
+        self.physics.submit(self.system.rescale, self.pos[:], self.size[:])
+        if self.replay is not None:
+            self.replay.fit(self.pos, self.size)
 
     def set_gravity(self, value):
         """Update gravity for all molecules based on slider value."""
         self.gravity = value
+        self.set_system_parameter("gravity", value)
         # for molecule in self.molecules:
         #     molecule.gravity = self.gravity
 
     def set_epsilon(self, value):
         """Update the epsilon parameter for Lennard-Jones potential."""
         self.epsilon = value
+        self.set_system_parameter("epsilon", value)
 
     def set_sigma(self, value):
         """Update the sigma parameter for Lennard-Jones potential."""
         self.sigma = value
-        
+        self.set_system_parameter("sigma", value)
+
     def set_delta(self, value):
         """Update the timestep for Verlet integration."""
         self.delta = value
+        self.update_time_scale()
 
     def toggle_intermolecular_forces(self):
         """Toggle intermolecular forces on or off."""
         self.intermolecular_forces = not self.intermolecular_forces
+        self.set_system_parameter("intermolecular_forces", self.intermolecular_forces)
+
+    def toggle_periodic(self):
+        """Switch between walls and a periodic box, which shows bulk behaviour with fewer molecules."""
+        self.periodic = not self.periodic
+        self.set_system_parameter("periodic", self.periodic)
+
+    def set_color_map(self, name):
+        """Colour molecules by one of the color_maps module's quantities, computed once per drawn frame."""
+        self.color_map = name
+        self.renderer.color_map = color_maps.create(name, ParticleSystem.color_slow, ParticleSystem.color_fast)
+        # Per-molecule potential energies cost an extra pass over the pairs, so they are only kept for this map
+        self.set_system_parameter("track_potential_energies", name == color_maps.PotentialEnergyColorMap.name)
+        self.renderer.update()
+
+    def cycle_color_map(self):
+        names = list(color_maps.color_maps)
+        self.set_color_map(names[(names.index(self.color_map) + 1) % len(names)])
 
     def toggle_forces_visible(self):
         """Toggle intermolecular forces on or off."""
         self.forces_visible = not self.forces_visible
-        # Set whether force arrows should be visible for this molecule
-        for molecule in self.molecules:
-            molecule.forces_visible = self.forces_visible
-            molecule.update_force_arrow()
+        self.renderer.forces_visible = self.forces_visible and not self.governor.degraded("force arrows")
+        self.renderer.update()
 
     def generate_solid(self):
         """Generate a solid-like arrangement of molecules."""
-        self.clear_molecules()
-        rows, cols = 11, 25
-        spacing_x = self.size[0] * 0.039
-        spacing_y = self.size[1] * 0.09
-        start_x = self.pos[0] + spacing_x
-        start_y = self.pos[1] + spacing_y
-
-        for row in range(rows):
-            for col in range(cols):
-                x = start_x + col * spacing_x
-                y = start_y + row * spacing_y
-                self.create_molecule(x, y, 0, 0)
+        self.generate_preset("Solid")
 
     def generate_liquid(self):
         """Generate a liquid-like arrangement of molecules."""
-        self.clear_molecules()
-        for _ in range(50):  # Create 50 molecules
-            x = uniform(self.pos[0] + 50, self.pos[0] + self.size[0] - 50)
-            y = uniform(self.pos[1] + 50, self.pos[1] + self.size[1] - 50)
-            vx = uniform(-50, 50)
-            vy = uniform(-50, 50)
-            self.create_molecule(x, y, vx, vy)
+        self.generate_preset("Liquid")
 
     def generate_gas(self):
         """Generate a gas-like arrangement of molecules."""
+        self.generate_preset("Gas")
+
+    def generate_preset(self, name):
+        """
+        Replace the current molecules with one of the named preset arrangements:
+        its pre-equilibrated state from the preset library when there is one for
+        the current epsilon, sigma, molecule size and game area size, otherwise
+        a freshly generated one.
+        """
         self.clear_molecules()
-        for _ in range(15):  # Create 30 molecules
-            x = uniform(self.pos[0] + 50, self.pos[0] + self.size[0] - 50)
-            y = uniform(self.pos[1] + 50, self.pos[1] + self.size[1] - 50)
-            vx = uniform(-200, 200)
-            vy = uniform(-200, 200)
+        entry = preset_library.load(name, self.epsilon, self.sigma, self.size, self.size_factor)
+        if entry is not None:
+            positions, velocities = preset_library.place(entry, self.pos,
+                                                         randomize=name in preset_library.fluid_presets)
+            self.physics.submit(self.system.add_particles, positions, velocities, self.molecule_radius)
+            return
+        for x, y, vx, vy in presets.generators[name](self.pos, self.size):
             self.create_molecule(x, y, vx, vy)
 
     def clear_molecules(self):
-        """Clear all molecules from the canvas and list."""
-        for molecule in self.molecules:
-            self.remove_widget(molecule)
-        self.molecules.clear()
+        """Clear all molecules from the particle system and the canvas."""
+        self.physics.submit(self.system.clear)
+        self.clear_bonds()  # Bonds refer to rows of the cleared system
+        self.selected_molecule = None
         gc.collect()
 
     def create_molecule(self, x, y, vx, vy):
         """Create and add a molecule to the game layout."""
-        molecule = Molecule(
-            molecule_center=(x, y),
-            molecule_radius=self.size[0] * self.molecule_radius_ratio * self.size_factor,
-            molecule_vx=vx,
-            molecule_vy=vy,
-            parent_pos=self.pos[:],
-            parent_size=self.size[:],
-            forces_visible=self.forces_visible,
-        )
-        self.add_widget(molecule)
-        self.molecules.append(molecule)
+        self.physics.submit(self.system.add_particle, x, y, vx, vy, self.molecule_radius)
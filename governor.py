@@ -0,0 +1,125 @@
+"""
+Adaptive quality governor: keeps the measured cost of a frame (drawing plus
+the physics stepped meanwhile) within a time budget by switching quality
+tiers off one at a time while over budget, and back on, in reverse order,
+once there is comfortable headroom again.
+"""
+from collections import deque
+import json
+import time
+
+
+class Tier:
+    """
+    A quality feature the governor may turn down; `apply(degraded)` turns it
+    down (True) or restores it (False). `active()`, when given, says whether
+    turning it down would currently save anything; inactive tiers are skipped.
+    """
+
+    def __init__(self, name, apply, active=None):
+        self.name = name
+        self.apply = apply
+        self.active = active or (lambda: True)
+
+
+class QualityGovernor:
+    """
+    Averages the cost of the last `window` frames. Above `budget` it degrades
+    the next tier; below `restore_fraction` of the budget, sustained for
+    `restore_window` frames, it restores the last degraded one. After every
+    transition it waits `cooldown` seconds and a fresh window before acting
+    again, so one slow frame or a tier's own start-up cost doesn't flip tiers
+    back and forth.
+    """
+
+    def __init__(self, tiers, budget=1 / 60.0, window=30, restore_window=180, restore_fraction=0.6, cooldown=1.0,
+                 log=print):
+        self.tiers = list(tiers)  # Cheapest loss of quality first
+        self.budget = budget
+        self.restore_fraction = restore_fraction
+        self.restore_window = restore_window
+        self.window = window
+        self.cooldown = cooldown
+        self.log = log
+        self.costs = deque(maxlen=max(window, restore_window))  # Seconds per frame, newest last
+        self.degraded_tiers = []  # Tiers turned down, in the order they were, each later in `tiers` than the last
+        self.last_transition = float("-inf")
+        self.transitions = []  # (time, tier name, "degraded" or "restored", average cost in ms)
+
+    @property
+    def level(self):
+        """How many tiers are degraded."""
+        return len(self.degraded_tiers)
+
+    def degraded(self, name):
+        """Whether the named tier is currently turned down."""
+        return any(tier.name == name for tier in self.degraded_tiers)
+
+    def next_tier(self):
+        """The next tier to turn down: the first active one after the last degraded, or None."""
+        start = self.tiers.index(self.degraded_tiers[-1]) + 1 if self.degraded_tiers else 0
+        return next((tier for tier in self.tiers[start:] if tier.active()), None)
+
+    def average(self, frames):
+        recent = list(self.costs)[-frames:]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    def observe(self, cost, now=None):
+        """
+        Record one frame's cost in seconds, degrading or restoring a tier if
+        the recent average calls for it.
+        :return: The tier that changed, or None.
+        """
+        now = time.perf_counter() if now is None else now
+        self.costs.append(cost)
+        if now - self.last_transition < self.cooldown:
+            return None
+
+        if len(self.costs) >= self.window:
+            average = self.average(self.window)
+            tier = self.next_tier() if average > self.budget else None
+            if tier is not None:
+                return self.transition(tier, True, average, now)
+        if len(self.costs) >= self.restore_window and self.degraded_tiers:
+            average = self.average(self.restore_window)
+            if average < self.restore_fraction * self.budget:
+                return self.transition(self.degraded_tiers[-1], False, average, now)
+        return None
+
+    def transition(self, tier, degrade, average, now):
+        tier.apply(degrade)
+        if degrade:
+            self.degraded_tiers.append(tier)
+        else:
+            self.degraded_tiers.remove(tier)
+        self.last_transition = now
+        self.costs.clear()
+        action = "degraded" if degrade else "restored"
+        self.transitions.append((now, tier.name, action, 1000 * average))
+        self.log(f"Quality governor: {action} {tier.name} at {1000 * average:.1f} ms/frame "
+                 f"(budget {1000 * self.budget:.1f} ms, level {self.level}/{len(self.tiers)})")
+        return tier
+
+    def metrics(self):
+        """Current state of the governor, as plain values."""
+        return {
+            "budget_ms": 1000 * self.budget,
+            "average_ms": 1000 * self.average(self.window),
+            "level": self.level,
+            "degraded": [tier.name for tier in self.degraded_tiers],
+            "degradations": sum(1 for transition in self.transitions if transition[2] == "degraded"),
+            "restorations": sum(1 for transition in self.transitions if transition[2] == "restored"),
+        }
+
+    def report(self):
+        """One line for the profiler overlay."""
+        metrics = self.metrics()
+        degraded = ", ".join(metrics["degraded"]) or "none"
+        return f"quality {metrics['average_ms']:.1f}/{metrics['budget_ms']:.1f} ms, degraded: {degraded}"
+
+    def dump_json(self, path):
+        """Write the metrics and every transition so far."""
+        transitions = [{"time": when, "tier": name, "action": action, "average_ms": cost}
+                       for when, name, action, cost in self.transitions]
+        with open(path, "w") as output:
+            json.dump({"metrics": self.metrics(), "transitions": transitions}, output, indent=2)
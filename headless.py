@@ -0,0 +1,132 @@
+"""
+Run the molecular dynamics physics without opening a Kivy window.
+
+    python -m headless --preset Solid --steps 1000
+    python -m headless --preset Gas --steps 3600 --trajectory gas.mdtraj
+"""
+import argparse
+import random
+import time
+
+import integrators
+import kernels
+from parallel_forces import ParallelForceBackend
+from trajectory import TrajectoryWriter
+from particle_system import ParticleSystem
+import presets
+
+
+def build_system(preset, width=1536, height=648, size_factor=presets.default_size_factor,
+                 epsilon=1.0, sigma=1.0, gravity=0, intermolecular_forces=True, use_verlet=True, backend=None,
+                 integrator=None, periodic=False):
+    """
+    Create a ParticleSystem filled with one of the GameLayout presets, in a box of the given size.
+    `integrator` names one from the integrators module and overrides `use_verlet`.
+    """
+    system = ParticleSystem(backend=backend)
+    system.set_bounds((0, 0), (width, height))
+    system.epsilon = epsilon
+    system.sigma = sigma
+    system.gravity = gravity
+    system.intermolecular_forces = intermolecular_forces
+    system.use_verlet = use_verlet
+    system.periodic = periodic
+    if integrator is not None:
+        system.integrator = integrators.create(integrator)
+
+    radius = presets.molecule_radius(width, size_factor)
+    for x, y, vx, vy in presets.generators[preset]((0, 0), (width, height)):
+        system.add_particle(x, y, vx, vy, radius)
+    return system
+
+
+def run(system, steps, delta=1 / 60.0, writer=None, frame_steps=1):
+    """
+    Step the system `steps` times with timestep `delta`, writing every
+    `frame_steps`-th step to the TrajectoryWriter `writer` if there is one.
+    :return: A dict with the elapsed time and steps / pair evaluations per second.
+    """
+    pairs_before = system.pair_evaluations
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        system.step(delta)
+        if writer is not None and step % frame_steps == 0:
+            system.update_colors()
+            writer.write_frame(system, step)
+    elapsed = time.perf_counter() - start
+
+    pair_evaluations = system.pair_evaluations - pairs_before
+    return {
+        "particles": system.count,
+        "steps": steps,
+        "elapsed": elapsed,
+        "steps_per_second": steps / elapsed if elapsed else float("inf"),
+        "pair_evaluations": pair_evaluations,
+        "pairs_per_second": pair_evaluations / elapsed if elapsed else float("inf"),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the molecular dynamics presets without a window.")
+    parser.add_argument("--preset", choices=sorted(presets.generators), default="Solid")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--width", type=float, default=1536, help="Width of the simulation box in pixels")
+    parser.add_argument("--height", type=float, default=648, help="Height of the simulation box in pixels")
+    parser.add_argument("--size-factor", type=float, default=presets.default_size_factor)
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--sigma", type=float, default=1.0)
+    parser.add_argument("--gravity", type=float, default=0)
+    parser.add_argument("--delta", type=float, default=1 / 60.0)
+    parser.add_argument("--no-forces", action="store_true", help="Disable intermolecular forces")
+    parser.add_argument("--no-verlet", action="store_true", help="Use the non-Verlet update instead")
+    parser.add_argument("--periodic", action="store_true", help="Wrap molecules around the box instead of walls")
+    parser.add_argument("--integrator", choices=sorted(integrators.integrators), default=None,
+                        help="Time integrator; overrides --no-verlet")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the Liquid and Gas layouts")
+    parser.add_argument("--backend", choices=sorted(kernels.backends), default=kernels.default_backend,
+                        help="Kernel backend for the inner loops")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for collisions and Lennard-Jones on large systems (0 runs in-process)")
+    parser.add_argument("--trajectory", default=None,
+                        help="Record the run to this trajectory file, for replay in the app (I key)")
+    parser.add_argument("--frame-steps", type=int, default=1, help="Steps between recorded trajectory frames")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    system = build_system(args.preset, args.width, args.height, args.size_factor,
+                          epsilon=args.epsilon, sigma=args.sigma, gravity=args.gravity,
+                          intermolecular_forces=not args.no_forces, use_verlet=not args.no_verlet,
+                          backend=args.backend, integrator=args.integrator, periodic=args.periodic)
+    if args.workers:
+        system.parallel_backend = ParallelForceBackend(args.workers)
+    writer = None
+    if args.trajectory:
+        writer = TrajectoryWriter(args.trajectory, (0, 0), (args.width, args.height),
+                                  frame_interval=args.delta * args.frame_steps)
+        writer.write_parameters(preset=args.preset, epsilon=args.epsilon, sigma=args.sigma, gravity=args.gravity,
+                                delta=args.delta, integrator=system.integrator.name)
+    try:
+        result = run(system, args.steps, args.delta, writer, args.frame_steps)
+    finally:
+        if system.parallel_backend is not None:
+            system.parallel_backend.close()
+        if writer is not None:
+            writer.close()
+
+    print(f"Preset: {args.preset} ({result['particles']} molecules, {system.integrator.name} integrator)")
+    print(f"Backend: {system.backend}")
+    if args.workers:
+        print(f"Workers: {args.workers} (used from {system.parallel_min_particles} molecules)")
+    print(f"Steps: {result['steps']} in {result['elapsed']:.3f} s")
+    if writer is not None:
+        print(f"Trajectory: {writer.frames} frames written to {args.trajectory}")
+    print(f"Throughput: {result['steps_per_second']:.1f} steps/s, {result['pairs_per_second']:.0f} pair evaluations/s")
+
+
+if __name__ == "__main__":
+    main()
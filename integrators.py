@@ -0,0 +1,150 @@
+"""
+Time integrators for ParticleSystem. Each one advances a system by dt in its
+step(system, dt), calling system.compute_forces() as often as its scheme
+needs; forces are treated as accelerations, as everywhere else in the engine.
+"""
+import numpy as np
+
+
+class VelocityVerlet:
+    """Drift and half-kick with the previous step's forces, recompute forces, second half-kick."""
+
+    name = "verlet"
+
+    def step(self, system, dt):
+        with system.timer.stage("integrate"):
+            system.verlet_drift(dt)
+        system.compute_forces()
+        with system.timer.stage("integrate"):
+            system.verlet_kick(dt)
+
+
+class Euler:
+    """The original non-Verlet update: forces go straight into velocities and the timestep is ignored."""
+
+    name = "euler"
+
+    def step(self, system, dt):
+        system.compute_forces()
+        with system.timer.stage("integrate"):
+            system.euler_step()
+
+
+class Leapfrog:
+    """
+    Leapfrog with velocities kept half a step ahead of positions: a full kick
+    with the forces at the current positions, then a full drift.
+    """
+
+    name = "leapfrog"
+
+    def step(self, system, dt):
+        system.compute_forces()
+        with system.timer.stage("integrate"):
+            system.speed_cap = system.verlet_speed_cap
+            system.cap_forces()
+            system.kernels.kick(system.velocities, system.forces, dt)
+            system.kernels.kick(system.positions, system.velocities, dt)
+            system.bounce_off_walls()
+            system.cap_speeds()
+
+
+class RungeKutta4:
+    """
+    Classic fourth-order Runge-Kutta on positions and velocities. Collisions
+    are resolved once at the start of the step; the three trial evaluations
+    only compute forces.
+    """
+
+    name = "rk4"
+
+    def step(self, system, dt):
+        system.speed_cap = system.verlet_speed_cap
+        system.compute_forces()
+        with system.timer.stage("integrate"):
+            positions = system.positions
+            velocities = system.velocities
+            system.cap_forces()
+            x0 = positions.copy()
+            v0 = velocities.copy()
+            position_sum = v0.copy()  # k1 for the positions
+            velocity_sum = system.forces.copy()  # k1 for the velocities
+
+        velocity = v0
+        acceleration = system.forces.copy()
+        for fraction, weight in ((0.5, 2), (0.5, 2), (1.0, 1)):
+            with system.timer.stage("integrate"):
+                # Trial state one stage further on, from the previous stage's slopes
+                np.multiply(velocity, fraction * dt, out=positions)
+                positions += x0
+                velocity = v0 + acceleration * (fraction * dt)
+            system.compute_forces(collide=False)
+            with system.timer.stage("integrate"):
+                system.cap_forces()
+                acceleration = system.forces.copy()
+                position_sum += weight * velocity
+                velocity_sum += weight * acceleration
+
+        with system.timer.stage("integrate"):
+            np.multiply(position_sum, dt / 6, out=positions)
+            positions += x0
+            np.multiply(velocity_sum, dt / 6, out=velocities)
+            velocities += v0
+            system.bounce_off_walls()
+            system.cap_speeds()
+
+
+class AdaptiveVerlet(VelocityVerlet):
+    """
+    Velocity Verlet that splits dt into halved substeps while the fastest or
+    most strongly pushed particle would move or change speed too much in one
+    substep, so large timesteps stay stable.
+    """
+
+    name = "adaptive"
+    max_displacement = 0.25  # Furthest any particle may move in one substep, as a fraction of the smallest radius
+    max_velocity_change = 50.0  # Largest change of speed (pixels/s) any particle may get in one substep
+    max_substeps = 64  # Substeps are never shorter than dt / max_substeps
+
+    def __init__(self):
+        self.substeps = 0  # Substeps taken by the last call to step(), for diagnostics
+
+    def substep_size(self, system, dt):
+        """Largest dt / 2^k (down to dt / max_substeps) within both limits, from the current velocities and forces."""
+        if not system.count:
+            return dt
+        max_speed = np.sqrt(np.einsum("ij,ij->i", system.velocities, system.velocities).max())
+        max_force = np.sqrt(np.einsum("ij,ij->i", system.forces, system.forces).max())
+        max_distance = self.max_displacement * system.radii.min()
+
+        size = dt
+        while size > dt / self.max_substeps and (
+                max_speed * size + 0.5 * max_force * size ** 2 > max_distance
+                or max_force * size > self.max_velocity_change):
+            size /= 2
+        return size
+
+    def step(self, system, dt):
+        remaining = dt
+        self.substeps = 0
+        while remaining > 1e-9 * dt:
+            size = min(self.substep_size(system, dt), remaining)
+            super().step(system, size)
+            remaining -= size
+            self.substeps += 1
+
+
+integrators = {
+    integrator.name: integrator
+    for integrator in (VelocityVerlet, Euler, Leapfrog, RungeKutta4, AdaptiveVerlet)
+}
+
+
+def create(name):
+    """
+    Return a new integrator of the named kind.
+    :raises ValueError: If no integrator has that name.
+    """
+    if name not in integrators:
+        raise ValueError(f"Unknown integrator {name!r}; choose from {sorted(integrators)}")
+    return integrators[name]()
@@ -0,0 +1,394 @@
+"""
+Inner loops of ParticleSystem.step behind a swappable backend.
+
+"numpy" runs them as whole-array operations and is always available.
+"numba" compiles them into plain loops over pairs, particles and cells, which
+avoids the temporary arrays NumPy needs and is several times faster for large
+systems; it is only offered when Numba is installed.
+"""
+import numpy as np
+
+from cell_list import CellList, bin_cells, grid_pairs
+from collisions import resolve_collisions
+from forces import lennard_jones_forces, lennard_jones_magnitude, lennard_jones_potential
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def wall_limits(radii, bounds_pos, bounds_size):
+    """Lowest and highest allowed centre coordinates for each particle."""
+    radii = radii[:, None]
+    low = np.asarray(bounds_pos) + radii
+    high = np.asarray(bounds_pos) + np.asarray(bounds_size) - radii
+    return low, high
+
+
+class NumpyKernels:
+    """Vectorized NumPy implementation of the step's inner loops."""
+
+    name = "numpy"
+
+    def __init__(self):
+        self.scratch = np.empty((0, 2))
+
+    def scratch_like(self, vectors):
+        """Reusable (N, 2) work array, so the integrator doesn't allocate temporaries every step."""
+        if len(self.scratch) < len(vectors):
+            self.scratch = np.empty((max(len(vectors), 2 * len(self.scratch)), 2))
+        return self.scratch[:len(vectors)]
+
+    def lennard_jones(self, positions, first, second, epsilon, sigma, scale, cutoff, shifted, out, totals=None,
+                      box=None, energies=None):
+        return lennard_jones_forces(positions, first, second, epsilon, sigma, scale, cutoff=cutoff,
+                                    shifted=shifted, out=out, totals=totals, box=box, energies=energies)
+
+    def resolve_collisions(self, positions, velocities, radii, first, second, separate, box=None):
+        return resolve_collisions(positions, velocities, radii, first, second, separate=separate, box=box)
+
+    def verlet_drift(self, positions, velocities, forces, dt):
+        scratch = self.scratch_like(positions)
+        np.multiply(velocities, dt, out=scratch)
+        positions += scratch
+        np.multiply(forces, 0.5 * dt * dt, out=scratch)
+        positions += scratch
+
+    def kick(self, velocities, forces, dt):
+        scratch = self.scratch_like(velocities)
+        np.multiply(forces, dt, out=scratch)
+        velocities += scratch
+
+    def bounce_off_walls(self, positions, velocities, radii, bounds_pos, bounds_size):
+        """
+        Mirror any particle that went past a wall back inside by as far as it
+        overshot, and reverse its velocity component if still heading out.
+        Particles that overshot by more than the box are clamped.
+        :return: Total momentum given to the walls (2 |v| per reversed component, unit mass).
+        """
+        low, high = wall_limits(radii, bounds_pos, bounds_size)
+        below = positions < low
+        above = positions > high
+        np.subtract(2 * low, positions, out=positions, where=below)
+        np.subtract(2 * high, positions, out=positions, where=above)
+        outward = (below & (velocities < 0)) | (above & (velocities > 0))
+        impulse = 2 * np.abs(velocities[outward]).sum()
+        velocities[outward] *= -1
+        np.clip(positions, low, high, out=positions)
+        return impulse
+
+    def keep_within_bounds(self, positions, radii, bounds_pos, bounds_size):
+        low, high = wall_limits(radii, bounds_pos, bounds_size)
+        np.clip(positions, low, high, out=positions)
+
+    def wrap(self, positions, bounds_pos, bounds_size):
+        """Move every particle centre back into the periodic box, shifting by whole box sizes."""
+        bounds_pos = np.asarray(bounds_pos, dtype=float)
+        positions -= bounds_pos
+        np.mod(positions, np.asarray(bounds_size, dtype=float), out=positions)
+        positions += bounds_pos
+
+    def bin_cells(self, ids):
+        """Sort particles by the linear id of their cell, as cell_list.bin_cells."""
+        return bin_cells(ids)
+
+    def grid_pairs(self, cell_ids, order, starts, shape, periodic, column_range=None):
+        """Pairs of particles in the same or neighbouring cells, as cell_list.grid_pairs."""
+        return grid_pairs(cell_ids, order, starts, shape, periodic, column_range)
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def lennard_jones_loop(positions, first, second, epsilon, sigma, scale, cutoff, shift, energy_offset, out,
+                           box_width, box_height, energies):
+        # Returns the pairs' potential energy (as forces.lennard_jones_pair_energies, in pixel units) and virial;
+        # a non-empty `energies` also gets each particle's half of its pairs' energy
+        energy = 0.0
+        virial = 0.0
+        for k in range(len(first)):
+            i = first[k]
+            j = second[k]
+            dx = positions[i, 0] - positions[j, 0]
+            dy = positions[i, 1] - positions[j, 1]
+            if box_width > 0:  # Periodic box: nearest image, as forces.minimum_image
+                dx -= box_width * np.round(dx / box_width)
+                dy -= box_height * np.round(dy / box_height)
+            distance = np.sqrt(dx * dx + dy * dy)
+            r = distance / scale
+            if r <= 0 or r > cutoff:
+                continue
+            sr6 = (sigma / r) ** 6
+            magnitude = 1000 * epsilon * (2 * sr6 * sr6 - sr6) / (r * r) - shift
+            potential = 1000 * epsilon * (2 * sr6 * sr6 / 13 - sr6 / 7) / r - energy_offset
+            if shift != 0:
+                potential += (r - cutoff) * shift
+            energy += potential
+            virial += distance * magnitude
+            if len(energies):
+                energies[i] += 0.5 * potential * scale
+                energies[j] += 0.5 * potential * scale
+            fx = dx * magnitude / distance
+            fy = dy * magnitude / distance
+            out[i, 0] += fx
+            out[i, 1] += fy
+            out[j, 0] -= fx
+            out[j, 1] -= fy
+        return energy * scale, virial
+
+    @numba.njit(cache=True)
+    def collision_loop(positions, velocities, radii, first, second, separate, collided, box_width, box_height):
+        # Impulses are summed from the pre-collision velocities, as in collisions.resolve_collisions
+        velocity_changes = np.zeros_like(velocities)
+        position_changes = np.zeros_like(positions)
+        for k in range(len(first)):
+            i = first[k]
+            j = second[k]
+            dx = positions[i, 0] - positions[j, 0]
+            dy = positions[i, 1] - positions[j, 1]
+            if box_width > 0:
+                dx -= box_width * np.round(dx / box_width)
+                dy -= box_height * np.round(dy / box_height)
+            distance = np.sqrt(dx * dx + dy * dy)
+            m1 = radii[i]
+            m2 = radii[j]
+            total_mass = m1 + m2
+            if distance <= 0 or distance > total_mass:
+                continue
+            nx = dx / distance
+            ny = dy / distance
+            v1n = nx * velocities[i, 0] + ny * velocities[i, 1]
+            v2n = nx * velocities[j, 0] + ny * velocities[j, 1]
+            exchange = 2 * (v2n - v1n) / total_mass
+            velocity_changes[i, 0] += nx * exchange * m2
+            velocity_changes[i, 1] += ny * exchange * m2
+            velocity_changes[j, 0] -= nx * exchange * m1
+            velocity_changes[j, 1] -= ny * exchange * m1
+            if separate:
+                push = (total_mass - distance) / total_mass
+                position_changes[i, 0] += nx * push * m2
+                position_changes[i, 1] += ny * push * m2
+                position_changes[j, 0] -= nx * push * m1
+                position_changes[j, 1] -= ny * push * m1
+            collided[i] = True
+            collided[j] = True
+        velocities += velocity_changes
+        positions += position_changes
+
+    @numba.njit(cache=True)
+    def verlet_drift_loop(positions, velocities, forces, dt):
+        for i in range(len(positions)):
+            for axis in range(2):
+                positions[i, axis] += velocities[i, axis] * dt + 0.5 * forces[i, axis] * dt * dt
+
+    @numba.njit(cache=True)
+    def kick_loop(velocities, forces, dt):
+        for i in range(len(velocities)):
+            for axis in range(2):
+                velocities[i, axis] += forces[i, axis] * dt
+
+    @numba.njit(cache=True)
+    def wall_loop(positions, velocities, radii, left, bottom, width, height):
+        # Mirrors overshooting particles as NumpyKernels.bounce_off_walls
+        impulse = 0.0
+        for i in range(len(positions)):
+            radius = radii[i]
+            for axis, start, length in ((0, left, width), (1, bottom, height)):
+                low = start + radius
+                high = start + length - radius
+                position = positions[i, axis]
+                if position < low:
+                    position = 2 * low - position
+                    if velocities[i, axis] < 0:
+                        impulse += 2 * abs(velocities[i, axis])
+                        velocities[i, axis] = -velocities[i, axis]
+                elif position > high:
+                    position = 2 * high - position
+                    if velocities[i, axis] > 0:
+                        impulse += 2 * abs(velocities[i, axis])
+                        velocities[i, axis] = -velocities[i, axis]
+                positions[i, axis] = min(max(position, low), high)
+        return impulse
+
+    @numba.njit(cache=True)
+    def clamp_loop(positions, radii, left, bottom, width, height):
+        for i in range(len(positions)):
+            radius = radii[i]
+            positions[i, 0] = min(max(positions[i, 0], left + radius), left + width - radius)
+            positions[i, 1] = min(max(positions[i, 1], bottom + radius), bottom + height - radius)
+
+    @numba.njit(cache=True)
+    def wrap_loop(positions, left, bottom, width, height):
+        for i in range(len(positions)):
+            positions[i, 0] = left + (positions[i, 0] - left) % width
+            positions[i, 1] = bottom + (positions[i, 1] - bottom) % height
+
+    @numba.njit(cache=True)
+    def bin_cells_loop(ids, cell_count):
+        # Counting sort of the particles by cell id, as cell_list.bin_cells (ids below cell_count)
+        fill = np.zeros(cell_count + 1, dtype=np.int64)
+        for cell in ids:
+            fill[cell + 1] += 1
+        occupied = 0
+        for cell in range(cell_count):
+            if fill[cell + 1] > 0:
+                occupied += 1
+            fill[cell + 1] += fill[cell]
+        cell_ids = np.empty(occupied, dtype=np.int64)
+        starts = np.empty(occupied + 1, dtype=np.int64)
+        k = 0
+        for cell in range(cell_count):
+            if fill[cell + 1] > fill[cell]:
+                cell_ids[k] = cell
+                starts[k] = fill[cell]
+                k += 1
+        starts[occupied] = len(ids)
+        order = np.empty(len(ids), dtype=np.int64)
+        for i in range(len(ids)):
+            order[fill[ids[i]]] = i
+            fill[ids[i]] += 1
+        return cell_ids, order, starts
+
+    @numba.njit(cache=True)
+    def grid_pairs_loop(cell_ids, order, starts, columns, rows, periodic, offsets, lowest, highest, dense_cells):
+        # As cell_list.grid_pairs for grids at least three cells across when periodic: count, then fill.
+        # Cells are looked up in a table over the whole grid when it isn't much larger than the occupied
+        # cells, as a binary search per lookup costs more than the rest of the loop
+        dense = columns * rows <= dense_cells * len(cell_ids) + 1024
+        slots = np.full(columns * rows if dense else 0, -1, dtype=np.int64)
+        if dense:
+            for k in range(len(cell_ids)):
+                slots[cell_ids[k]] = k
+        neighbours = np.full((len(cell_ids), len(offsets)), -1, dtype=np.int64)
+        total = 0
+        for k in range(len(cell_ids)):
+            column = cell_ids[k] // rows
+            if column < lowest or column > highest:
+                continue
+            row = cell_ids[k] % rows
+            count = starts[k + 1] - starts[k]
+            total += count * (count - 1) // 2
+            for o in range(len(offsets)):
+                other_column = column + offsets[o, 0]
+                other_row = row + offsets[o, 1]
+                if periodic:
+                    other_column %= columns
+                    other_row %= rows
+                elif other_column < 0 or other_column >= columns or other_row < 0 or other_row >= rows:
+                    continue
+                other_id = other_column * rows + other_row
+                if dense:
+                    other = slots[other_id]
+                else:
+                    other = np.searchsorted(cell_ids, other_id)
+                    if other == len(cell_ids) or cell_ids[other] != other_id:
+                        other = -1
+                if other >= 0:
+                    neighbours[k, o] = other
+                    total += count * (starts[other + 1] - starts[other])
+
+        first = np.empty(total, dtype=np.int64)
+        second = np.empty(total, dtype=np.int64)
+        n = 0
+        for k in range(len(cell_ids)):
+            column = cell_ids[k] // rows
+            if column < lowest or column > highest:
+                continue
+            for a in range(starts[k], starts[k + 1]):
+                for b in range(a + 1, starts[k + 1]):
+                    first[n] = order[a]
+                    second[n] = order[b]
+                    n += 1
+            for o in range(len(offsets)):
+                other = neighbours[k, o]
+                if other < 0:
+                    continue
+                for a in range(starts[k], starts[k + 1]):
+                    for b in range(starts[other], starts[other + 1]):
+                        first[n] = order[a]
+                        second[n] = order[b]
+                        n += 1
+        return first, second
+
+
+class NumbaKernels:
+    """Numba-compiled loops; each is compiled on first use and cached on disk."""
+
+    name = "numba"
+    no_energies = np.zeros(0)  # Stands in for the optional per-particle energies, which Numba can't take as None
+    forward_offsets = np.array(CellList.neighbour_offsets, dtype=np.int64)
+    # Most grid cells per particle (per occupied cell when pairing) for which loops walk the whole grid
+    # rather than sorting or searching the occupied cells
+    dense_grid_cells = 8
+
+    def lennard_jones(self, positions, first, second, epsilon, sigma, scale, cutoff, shifted, out, totals=None,
+                      box=None, energies=None):
+        if len(first) == 0:
+            return out
+        shift = lennard_jones_magnitude(cutoff, epsilon, sigma) if shifted and cutoff is not None else 0.0
+        energy_offset = lennard_jones_potential(cutoff, epsilon, sigma) if cutoff is not None else 0.0
+        box_width, box_height = (0.0, 0.0) if box is None else (float(box[0]), float(box[1]))
+        energy, virial = lennard_jones_loop(positions, first, second, float(epsilon), float(sigma), float(scale),
+                                            np.inf if cutoff is None else float(cutoff), float(shift),
+                                            float(energy_offset), out, box_width, box_height,
+                                            self.no_energies if energies is None else energies)
+        if totals is not None:
+            totals[0] += energy
+            totals[1] += virial
+        return out
+
+    def resolve_collisions(self, positions, velocities, radii, first, second, separate, box=None):
+        collided = np.zeros(len(positions), dtype=np.bool_)
+        box_width, box_height = (0.0, 0.0) if box is None else (float(box[0]), float(box[1]))
+        if len(first):
+            collision_loop(positions, velocities, radii, first, second, bool(separate), collided,
+                           box_width, box_height)
+        return np.flatnonzero(collided)
+
+    def verlet_drift(self, positions, velocities, forces, dt):
+        verlet_drift_loop(positions, velocities, forces, float(dt))
+
+    def kick(self, velocities, forces, dt):
+        kick_loop(velocities, forces, float(dt))
+
+    def bounce_off_walls(self, positions, velocities, radii, bounds_pos, bounds_size):
+        return wall_loop(positions, velocities, radii, float(bounds_pos[0]), float(bounds_pos[1]),
+                         float(bounds_size[0]), float(bounds_size[1]))
+
+    def keep_within_bounds(self, positions, radii, bounds_pos, bounds_size):
+        clamp_loop(positions, radii, float(bounds_pos[0]), float(bounds_pos[1]),
+                   float(bounds_size[0]), float(bounds_size[1]))
+
+    def wrap(self, positions, bounds_pos, bounds_size):
+        wrap_loop(positions, float(bounds_pos[0]), float(bounds_pos[1]), float(bounds_size[0]), float(bounds_size[1]))
+
+    def bin_cells(self, ids):
+        cell_count = int(ids.max()) + 1 if len(ids) else 0
+        if cell_count > self.dense_grid_cells * len(ids) + 1024:
+            return bin_cells(ids)  # A sparse grid: sorting beats counting over mostly empty cells
+        return bin_cells_loop(ids.astype(np.int64), cell_count)
+
+    def grid_pairs(self, cell_ids, order, starts, shape, periodic, column_range=None):
+        columns, rows = int(shape[0]), int(shape[1])
+        if periodic and min(columns, rows) < 3:
+            return grid_pairs(cell_ids, order, starts, shape, periodic, column_range)  # Needs cell pair dedupe
+        lowest, highest = (0, columns - 1) if column_range is None else (int(column_range[0]), int(column_range[1]))
+        return grid_pairs_loop(cell_ids, order, starts, columns, rows, bool(periodic), self.forward_offsets,
+                               lowest, highest, self.dense_grid_cells)
+
+
+backends = {"numpy": NumpyKernels}
+if numba is not None:
+    backends["numba"] = NumbaKernels
+default_backend = "numba" if numba is not None else "numpy"
+
+
+def load(name=None):
+    """
+    Return the kernels of the named backend, or of the fastest available one when name is None.
+    :raises ValueError: If the backend is unknown or its dependency isn't installed.
+    """
+    name = name or default_backend
+    if name not in backends:
+        raise ValueError(f"Kernel backend {name!r} is not available; choose from {sorted(backends)}")
+    return backends[name]()
@@ -0,0 +1,199 @@
+from kivy.graphics import InstructionGroup, Mesh, RenderContext
+import numpy as np
+
+
+class MoleculeRenderer:
+    """
+    Draws every particle of a ParticleSystem, plus its force arrow and any
+    bonds, straight from the system's arrays. Particles are batched into a
+    handful of meshes on one canvas instead of being one widget each.
+    """
+
+    circle_segments = 20  # Triangles used to approximate each molecule
+    max_mesh_vertices = 65535  # Kivy mesh indices are unsigned shorts
+    vertex_format = [(b'vPosition', 2, 'float'), (b'vColor', 4, 'float')]
+    bond_color = (1, 1, 1, 1)
+
+    # The default Kivy shader has a single colour per canvas, so use one with per-vertex colours
+    vertex_shader = '''
+    #ifdef GL_ES
+        precision highp float;
+    #endif
+    attribute vec2 vPosition;
+    attribute vec4 vColor;
+    uniform mat4 modelview_mat;
+    uniform mat4 projection_mat;
+    varying vec4 frag_color;
+    void main() {
+        frag_color = vColor;
+        gl_Position = projection_mat * modelview_mat * vec4(vPosition, 0.0, 1.0);
+    }
+    '''
+    fragment_shader = '''
+    #ifdef GL_ES
+        precision highp float;
+    #endif
+    varying vec4 frag_color;
+    void main() {
+        gl_FragColor = frag_color;
+    }
+    '''
+
+    def __init__(self, canvas, system, color_map=None):
+        self.system = system
+        self.bonds = None  # Optional BondTable drawn as lines between particle centres
+        self.forces_visible = True
+        self.bonds_visible = True
+        self.color_map = color_map  # color_maps.ColorMap colouring the molecules each frame; None uses system.colors
+
+        self.context = RenderContext(use_parent_projection=True, use_parent_modelview=True)
+        self.context.shader.vs = self.vertex_shader
+        self.context.shader.fs = self.fragment_shader
+        canvas.add(self.context)
+        # Bonds go in a group added first, so they are drawn underneath the molecules
+        self.bond_group = InstructionGroup()
+        self.context.add(self.bond_group)
+
+        # Unit circle around each molecule's centre, drawn as a fan of triangles
+        self.circle_outline = unit_circle(self.circle_segments)
+        ring = np.arange(self.circle_segments)
+        self.circle_triangles = np.stack((np.zeros_like(ring), ring + 1, (ring + 1) % self.circle_segments + 1), axis=1).ravel()
+        # Each force arrow is a thin quad made of two triangles
+        self.arrow_triangles = np.array([0, 1, 2, 2, 1, 3])
+        self.bond_segment = np.array([0, 1])
+
+        self.circle_meshes = []
+        self.arrow_meshes = []
+        self.bond_meshes = []
+        self.bond_buffer = np.empty((0, 2, 6), dtype=np.float32)  # Reused every frame, grown as bonds are added
+        self.circle_buffer = np.empty((0, self.circle_segments + 1, 6), dtype=np.float32)  # Likewise for molecules
+        self.vertex_buffers = {}  # Keeps each mesh's vertex array alive while the mesh references it
+        self.index_buffers = {}
+
+    def update(self):
+        """Rebuild the vertex buffers from the particle system's current state."""
+        self.draw_batches(self.bond_meshes, self.bond_vertices(), self.bond_segment, mode='lines', group=self.bond_group)
+        self.draw_batches(self.circle_meshes, self.circle_vertices(), self.circle_triangles)
+        if self.forces_visible:
+            self.draw_batches(self.arrow_meshes, arrow_vertices(self.system), self.arrow_triangles)
+        else:
+            self.draw_batches(self.arrow_meshes, np.empty((0, 4, 6), dtype=np.float32), self.arrow_triangles)
+
+    @property
+    def particle_colors(self):
+        """(N, 4) view of the colour each molecule was last drawn in."""
+        return self.circle_buffer[:self.system.count, 0, 2:]
+
+    def circle_vertices(self):
+        """circle_vertices of the system, written into the reused circle buffer and coloured by color_map."""
+        count = self.system.count
+        if count > len(self.circle_buffer):
+            self.circle_buffer = np.empty((max(count, 2 * len(self.circle_buffer)),) + self.circle_buffer.shape[1:],
+                                          dtype=np.float32)
+        return circle_vertices(self.system, self.circle_outline, self.circle_buffer[:count], self.color_map)
+
+    def bond_vertices(self):
+        """(bonds, 2, 6) array of both ends of every bond, written into the reused bond buffer."""
+        count = len(self.bonds) if self.bonds is not None and self.bonds_visible else 0
+        if count > len(self.bond_buffer):
+            self.bond_buffer = np.empty((max(count, 2 * len(self.bond_buffer)), 2, 6), dtype=np.float32)
+            self.bond_buffer[:, :, 2:] = self.bond_color
+        vertices = self.bond_buffer[:count]
+        if count:
+            positions = self.system.positions
+            np.take(positions, self.bonds.first, axis=0, out=vertices[:, 0, :2])
+            np.take(positions, self.bonds.second, axis=0, out=vertices[:, 1, :2])
+        return vertices
+
+    def draw_batches(self, meshes, vertices, shape_indices, mode='triangles', group=None):
+        """
+        Split per-particle vertex blocks into meshes small enough for 16-bit
+        indices, creating meshes as needed and emptying the unused ones.
+        New meshes are added to `group`, or to the render context if it is None.
+        """
+        vertices_per_shape = vertices.shape[1]
+        shapes_per_mesh = self.max_mesh_vertices // vertices_per_shape
+        batches = -(-len(vertices) // shapes_per_mesh)
+
+        while len(meshes) < batches:
+            mesh = Mesh(fmt=self.vertex_format, mode=mode)
+            (group if group is not None else self.context).add(mesh)
+            meshes.append(mesh)
+
+        for batch, mesh in enumerate(meshes):
+            block = vertices[batch * shapes_per_mesh:(batch + 1) * shapes_per_mesh]
+            if not len(block):
+                mesh.vertices = []
+                mesh.indices = []
+                continue
+            indices = self.batch_indices(len(block), shapes_per_mesh, vertices_per_shape, shape_indices)
+            block = np.ascontiguousarray(block).ravel()
+            self.vertex_buffers[id(mesh)] = block
+            mesh.vertices = block
+            mesh.indices = indices
+
+    def batch_indices(self, count, shapes_per_mesh, vertices_per_shape, shape_indices):
+        """
+        Index buffer for `count` copies of a shape. The buffer for a full mesh is
+        built once per shape and every smaller batch uses a prefix of it.
+        """
+        key = (vertices_per_shape, len(shape_indices))
+        if key not in self.index_buffers:
+            offsets = np.arange(shapes_per_mesh, dtype=np.uint32)[:, None] * vertices_per_shape
+            self.index_buffers[key] = (offsets + shape_indices).ravel().astype(np.uint16)
+        return self.index_buffers[key][:count * len(shape_indices)]
+
+
+def unit_circle(segments):
+    """(segments, 2) array of points evenly spaced around the unit circle."""
+    angles = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    return np.stack((np.cos(angles), np.sin(angles)), axis=1).astype(np.float32)
+
+
+def circle_vertices(system, outline, out=None, color_map=None):
+    """
+    (N, segments + 1, 6) array of x, y, r, g, b, a for every molecule's centre and outline.
+    :param out: Array to write the vertices into instead of a new one.
+    :param color_map: ColorMap that writes each molecule's colour into its centre vertex, copied
+                      to the outline; None uses system.colors.
+    """
+    vertices = np.empty((system.count, len(outline) + 1, 6), dtype=np.float32) if out is None else out
+    vertices[:, 0, :2] = system.positions
+    vertices[:, 1:, :2] = system.positions[:, None, :] + system.radii[:, None, None] * outline
+    if color_map is None:
+        vertices[:, :, 2:] = system.colors[:, None, :]
+    else:
+        color_map.colors(system, vertices[:, 0, 2:])
+        vertices[:, 1:, 2:] = vertices[:, :1, 2:]
+    return vertices
+
+
+def arrow_vertices(system):
+    """
+    (N, 4, 6) array of quads showing each molecule's total force. The arrow
+    grows and shifts from blue to red with the logarithm of the force.
+    """
+    positions = system.positions
+    forces = system.forces
+    radii = system.radii
+    magnitudes = np.hypot(forces[:, 0], forces[:, 1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(magnitudes > 0, np.log10(magnitudes) + 5, 0) / 5
+        directions = np.where(magnitudes[:, None] > 0, forces / magnitudes[:, None], 0)
+    t = np.clip(t, 0, 1)  # Scale t between 0 and 1 for color interpolation
+
+    ends = positions + directions * (radii * 3 * t)[:, None]
+    half_width = (radii / 10)[:, None]  # Line width of 4 * radius / 20
+    sides = np.stack((-directions[:, 1], directions[:, 0]), axis=1) * half_width
+
+    vertices = np.empty((len(positions), 4, 6), dtype=np.float32)
+    vertices[:, 0, :2] = positions - sides
+    vertices[:, 1, :2] = positions + sides
+    vertices[:, 2, :2] = ends - sides
+    vertices[:, 3, :2] = ends + sides
+    vertices[:, :, 2] = t[:, None]  # Transition from blue to red
+    vertices[:, :, 3] = 0
+    vertices[:, :, 4] = 1 - t[:, None]
+    vertices[:, :, 5] = 1
+    return vertices
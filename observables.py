@@ -0,0 +1,92 @@
+"""
+Thermodynamic observables of a ParticleSystem, in the engine's own units:
+unit mass, Boltzmann constant 1, lengths in pixels.
+
+Energies and the virial come from totals the force pass already accumulates
+(ParticleSystem.lj_totals and spring_totals) and the wall pressure from the
+momentum the walls absorbed while bouncing particles, so sampling costs one
+O(N) kinetic energy sum and no extra pass over pairs. Samples are written
+into preallocated rows (a Recorder's, when given one) rather than new arrays.
+"""
+import numpy as np
+
+
+class Observables:
+    """
+    Samples energy, temperature and pressure and keeps running averages over
+    the last `window` samples, updated in O(1) per sample.
+    """
+
+    fields = ("kinetic_energy", "lj_potential_energy", "spring_potential_energy", "total_energy",
+              "temperature", "virial_pressure", "wall_pressure")
+
+    def __init__(self, window=60):
+        self.window = window
+        self.samples = np.zeros((window, len(self.fields)))  # Last `window` samples, oldest overwritten first
+        self.sums = np.zeros(len(self.fields))
+        self.measured = np.zeros(len(self.fields))  # Where samples go when no other row is given
+        self.count = 0  # Samples held, up to window
+        self.next = 0  # Row the next sample goes in
+        self.last_wall_impulse = None
+        self.last_time = None
+
+    def measure(self, system, out=None):
+        """
+        Instantaneous value of every field, in the order of `fields`.
+        :param out: Array of len(fields) the values are written into; defaults to `measured`.
+        :return: `out`
+        """
+        kinetic = 0.5 * np.einsum("ij,ij->", system.velocities, system.velocities)
+        lj_energy, lj_virial = system.lj_totals
+        spring_energy, spring_virial = system.spring_totals
+        temperature = kinetic / system.count if system.count else 0.0  # Two degrees of freedom of kT/2 each
+
+        width, height = system.bounds_size
+        # 2D virial theorem: P A = N k T + (1/2) sum of r_ij . F_ij
+        virial_pressure = (kinetic + 0.5 * (lj_virial + spring_virial)) / (width * height)
+
+        # Momentum absorbed by the walls per unit time and unit wall length since the previous sample
+        wall_pressure = 0.0
+        if self.last_time is not None and system.elapsed_time > self.last_time:
+            impulse = system.wall_impulse - self.last_wall_impulse
+            wall_pressure = impulse / ((system.elapsed_time - self.last_time) * 2 * (width + height))
+        self.last_wall_impulse = system.wall_impulse
+        self.last_time = system.elapsed_time
+
+        out = self.measured if out is None else out
+        out[0] = kinetic
+        out[1] = lj_energy
+        out[2] = spring_energy
+        out[3] = kinetic + lj_energy + spring_energy
+        out[4] = temperature
+        out[5] = virial_pressure
+        out[6] = wall_pressure
+        return out
+
+    def sample(self, system, out=None):
+        """
+        Measure the system into `out` (as measure) and fold the values into the
+        running averages; returns the measurement.
+        """
+        values = self.measure(system, out)
+        oldest = self.samples[self.next]
+        self.sums -= oldest
+        self.sums += values
+        oldest[:] = values
+        self.next = (self.next + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        return values
+
+    def reset(self):
+        self.samples[:] = 0
+        self.sums[:] = 0
+        self.count = 0
+        self.next = 0
+        self.last_wall_impulse = None
+        self.last_time = None
+
+    def averages(self):
+        """{field: running average}, or an empty dict before the first sample."""
+        if not self.count:
+            return {}
+        return dict(zip(self.fields, (self.sums / self.count).tolist()))
@@ -0,0 +1,280 @@
+"""
+Optional multiprocess backend for the pair stage of ParticleSystem.step.
+
+The simulation box is split into vertical strips, one per worker process, and
+each worker owns the particles whose centre is in its strip. The system's
+per-particle arrays are moved into a shared memory block once, so workers
+read and write them in place and no particle data is copied or pickled
+between processes per step; only a small parameter dict crosses the process
+boundary. Workers run the same kernel backend as the system.
+
+A step runs in two phases, like the serial path: first every worker resolves
+the collisions touching its particles and the separated positions are
+written back, then every worker adds the Lennard-Jones forces on its
+particles at those positions. Pairs straddling two strips are evaluated by
+both workers, each keeping only its own particle's share, so every row of
+the shared arrays has exactly one writer and no per-worker copies need
+summing.
+"""
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from cell_list import CellList
+import kernels
+
+# Arrays of the system that live in the shared block, then the collision phase's output
+system_fields = {"positions": 2, "velocities": 2, "forces": 2, "radii": 1, "potential_energies": 1}
+change_fields = {"resolved_velocities": 2, "resolved_positions": 2}
+
+
+def shared_layout(capacity):
+    """(offset, shape) of each array in the shared block, and the block's size in bytes."""
+    layout = {}
+    offset = 0
+    for name, width in {**system_fields, **change_fields}.items():
+        shape = (capacity, width) if width > 1 else (capacity,)
+        layout[name] = (offset, shape)
+        offset += int(np.prod(shape)) * np.dtype(float).itemsize
+    return layout, offset
+
+
+def shared_views(memory, capacity):
+    """NumPy views over a shared memory block laid out by shared_layout."""
+    layout, _ = shared_layout(capacity)
+    return {name: np.ndarray(shape, dtype=float, buffer=memory.buf, offset=offset)
+            for name, (offset, shape) in layout.items()}
+
+
+class Strip:
+    """
+    One worker's share of a step: the particles it owns and the pairs touching
+    them, kept from the collision phase for the force phase, as the serial
+    path reuses its candidate pairs. Each worker keeps a cell list of every
+    particle, updated incrementally, but only collects pairs from the columns
+    of cells around its strip.
+    """
+
+    def __init__(self, worker, workers):
+        self.worker = worker
+        self.workers = workers
+        self.kernels = None
+        self.cells = CellList()
+        self.owned = np.empty(0, dtype=bool)  # Which particles this worker owns
+        self.internal = (np.empty(0, dtype=np.int64),) * 2  # Pairs of two owned particles
+        self.boundary = (np.empty(0, dtype=np.int64),) * 2  # Pairs of an owned particle and another worker's
+        self.forces = np.empty((0, 2))  # Scratch the forces on every particle are summed into
+        self.energies = np.empty(0)
+
+    def select(self, positions, params):
+        """Find this worker's particles and the candidate pairs touching them."""
+        if self.kernels is None or self.kernels.name != params["backend"]:
+            self.kernels = kernels.load(params["backend"])
+            self.cells.kernels = self.kernels
+        strip_width = params["width"] / self.workers
+        strips = ((positions[:, 0] - params["left"]) // strip_width).astype(int)
+        # The outer strips are open-ended, so particles past the walls are still owned by someone
+        self.owned = np.clip(strips, 0, self.workers - 1) == self.worker
+
+        self.cells.set_cell_size(params["neighbor_cutoff"])
+        self.cells.update(positions)
+        if not self.owned.any():
+            self.internal = self.boundary = (np.empty(0, dtype=np.int64),) * 2
+            return
+        owned_columns = self.cells.particle_cells[self.owned, 0]
+        first, second = self.cells.pairs((owned_columns.min() - 1, owned_columns.max() + 1))
+        owned_first, owned_second = self.owned[first], self.owned[second]
+        internal = owned_first & owned_second
+        boundary = owned_first ^ owned_second
+        self.internal = first[internal], second[internal]
+        self.boundary = first[boundary], second[boundary]
+
+    def collide(self, arrays, count, params):
+        """
+        Write the owned particles' velocities (and positions, when separating)
+        after their collisions.
+        :return: Candidate pairs this worker evaluates, a pair straddling two
+                 strips counting only for the worker owning its lower index.
+        """
+        self.select(arrays["positions"][:count], params)
+        first, second = (np.concatenate(ends) for ends in zip(self.internal, self.boundary))
+        # Collide copies, as other workers are still reading the shared arrays
+        positions = arrays["positions"][:count].copy()
+        velocities = arrays["velocities"][:count].copy()
+        self.kernels.resolve_collisions(positions, velocities, arrays["radii"][:count], first, second,
+                                        params["separate_collisions"])
+        arrays["resolved_velocities"][:count][self.owned] = velocities[self.owned]
+        arrays["resolved_positions"][:count][self.owned] = positions[self.owned]
+        boundary_first, boundary_second = self.boundary
+        lower_owned = self.owned[np.minimum(boundary_first, boundary_second)]
+        return len(self.internal[0]) + int(np.count_nonzero(lower_owned))
+
+    def interact(self, arrays, count, params):
+        """
+        Add the Lennard-Jones forces (and energies, when tracked) on the owned particles.
+        :return: (potential energy, virial) of this worker's pairs, each straddling pair counting half.
+        """
+        if len(self.forces) < count:
+            self.forces = np.empty((count, 2))
+            self.energies = np.empty(count)
+        forces = self.forces[:count]
+        forces[:] = 0
+        energies = None
+        if params["track_potential_energies"]:
+            energies = self.energies[:count]
+            energies[:] = 0
+
+        positions = arrays["positions"][:count]
+        totals = np.zeros(2)
+        boundary_totals = np.zeros(2)
+        for (first, second), pair_totals in ((self.internal, totals), (self.boundary, boundary_totals)):
+            self.kernels.lennard_jones(positions, first, second, params["epsilon"], params["sigma"], params["scale"],
+                                       params["lj_cutoff"], params["lj_shifted"], forces, pair_totals,
+                                       energies=energies)
+        arrays["forces"][:count][self.owned] += forces[self.owned]
+        if energies is not None:
+            arrays["potential_energies"][:count][self.owned] += energies[self.owned]
+        totals += 0.5 * boundary_totals  # The worker owning the other particle counts the other half
+        return totals[0], totals[1]
+
+
+def worker_main(connection, worker, workers):
+    """Loop run by each worker process, answering commands from ParallelForceBackend."""
+    memory = None
+    arrays = None
+    strip = Strip(worker, workers)
+    while True:
+        command, *args = connection.recv()
+        if command == "attach":
+            name, capacity = args
+            arrays = None
+            if memory is not None:
+                memory.close()
+            memory = shared_memory.SharedMemory(name=name)
+            arrays = shared_views(memory, capacity)
+            connection.send(True)
+        elif command == "collide":
+            count, params = args
+            connection.send(strip.collide(arrays, count, params))
+        elif command == "interact":
+            count, params = args
+            connection.send(strip.interact(arrays, count, params))
+        elif command == "close":
+            break
+    arrays = None
+    if memory is not None:
+        memory.close()
+
+
+class ParallelForceBackend:
+    """
+    Pool of worker processes computing collisions and Lennard-Jones forces
+    strip by strip. The system it is applied to keeps its particle arrays in
+    the pool's shared memory until the pool is closed or applied to another
+    system.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = 0
+        self.memory = None
+        self.arrays = None
+        self.system = None  # The system whose arrays live in the shared block
+
+        # Don't fork the Kivy/GL state into the workers. Spawned workers re-import the main module, so an
+        # entry point must keep its Kivy imports under its __main__ guard (as main.py does)
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for worker in range(self.workers):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=worker_main, args=(child_end, worker, self.workers), daemon=True)
+            process.start()
+            self.connections.append(parent_end)
+            self.processes.append(process)
+        atexit.register(self.close)
+
+    def attach(self, system):
+        """
+        Move the system's arrays into the shared block, reallocating it (and
+        re-attaching the workers) when the system's capacity changed.
+        Does nothing once they are in place.
+        """
+        if system is not self.system or system.capacity != self.capacity:
+            self.release_memory()
+            capacity = system.capacity
+            _, size = shared_layout(capacity)
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.capacity = capacity
+            self.arrays = shared_views(self.memory, capacity)
+            self.broadcast("attach", self.memory.name, capacity)
+            self.system = system
+        system.adopt_arrays({name: self.arrays[name] for name in system_fields})
+
+    def broadcast(self, *command):
+        """Send a command to every worker and return their replies."""
+        for connection in self.connections:
+            connection.send(command)
+        return [connection.recv() for connection in self.connections]
+
+    def apply(self, system):
+        """
+        Run the pair stage for `system` across the workers: resolve collisions
+        and separate the pairs, then add the Lennard-Jones forces at the
+        separated positions.
+        :return: The number of candidate pairs evaluated.
+        """
+        count = system.count
+        self.attach(system)
+        params = {
+            "neighbor_cutoff": system.neighbor_cutoff(),
+            "left": system.bounds_pos[0],
+            "width": system.bounds_size[0],
+            "separate_collisions": system.separate_collisions,
+            "backend": system.backend,
+        }
+        pair_evaluations = sum(self.broadcast("collide", count, params))
+
+        velocities = self.arrays["resolved_velocities"][:count]
+        collided = np.flatnonzero((velocities != system.velocities).any(axis=1))
+        system.velocities[:] = velocities
+        system.positions[:] = self.arrays["resolved_positions"][:count]
+        system.cap_speeds(collided)
+
+        if system.intermolecular_forces:
+            params.update({
+                "epsilon": system.epsilon,
+                "sigma": system.sigma,
+                "scale": system.scale,
+                "lj_cutoff": system.lj_cutoff_distance,
+                "lj_shifted": system.lj_shifted,
+                "track_potential_energies": system.track_potential_energies,
+            })
+            for energy, virial in self.broadcast("interact", count, params):
+                system.lj_totals += (energy, virial)
+        return pair_evaluations
+
+    def release_memory(self):
+        """Move the attached system's arrays back into ordinary memory and free the shared block."""
+        if self.memory is not None:
+            if self.system is not None:
+                self.system.release_arrays({name: self.arrays[name] for name in system_fields})
+                self.system = None
+            self.arrays = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+            self.capacity = 0
+
+    def close(self):
+        """Stop the workers and free the shared memory; safe to call more than once."""
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                connection.send(("close",))
+                process.join(timeout=1)
+        self.connections = []
+        self.processes = []
+        self.release_memory()
@@ -0,0 +1,384 @@
+import numpy as np
+
+from cell_list import CellList
+import color_maps
+from forces import all_pairs, lennard_jones_pair_energies
+import integrators
+import kernels
+from profiler import NullTimer
+
+
+class ParticleSystem:
+    """
+    Headless molecular dynamics engine. Every particle is a row in a set of
+    contiguous NumPy arrays (centre position, velocity, force, radius and RGBA
+    colour), so a step is a handful of array operations rather than one
+    method call per molecule.
+    """
+
+    color_slow = list(color_maps.default_low_color)
+    color_fast = list(color_maps.default_high_color)
+    verlet_speed_cap = 500
+    euler_speed_cap = 8
+    force_cap = 30000
+    # Below this many particles every pair is checked and the cell list is skipped; the two cost the same
+    # step time at about 300 particles, with or without intermolecular forces
+    dense_pair_limit = 300
+
+    def __init__(self, capacity=64, backend=None):
+        """
+        :param capacity: Particles the arrays hold before they first grow.
+        :param backend: Name of the kernel backend running the inner loops (see kernels.backends);
+                        None picks the fastest one installed.
+        """
+        self.count = 0
+        self._positions = np.zeros((capacity, 2))
+        self._velocities = np.zeros((capacity, 2))
+        self._forces = np.zeros((capacity, 2))
+        self._radii = np.zeros(capacity)
+        self._colors = np.zeros((capacity, 4))
+        self._potential_energies = np.zeros(capacity)
+
+        # Simulation box (bottom-left corner and size), in pixels
+        self.bounds_pos = (0, 0)
+        self.bounds_size = (1, 1)
+
+        # Physics parameters, kept in sync by GameLayout
+        self.gravity = 0
+        self.epsilon = 1.0
+        self.sigma = 1.0
+        self.scale = 10 ** 2  # Pixels per unit of sigma
+        self.lj_cutoff = 2.5  # Lennard-Jones cutoff in units of sigma
+        self.lj_shifted = True  # Shift the force to zero at the cutoff so truncation doesn't inject energy
+        self.intermolecular_forces = True
+        self.separate_collisions = True  # Push overlapping pairs apart after resolving them
+        self.track_potential_energies = False  # Fill potential_energies in the force pass, for colouring
+        self.periodic = False  # Wrap particles around the box edges, with pairs measured to the nearest image
+        self.integrator = integrators.VelocityVerlet()  # Any integrator from the integrators module
+        self.speed_cap = self.verlet_speed_cap
+
+        # Callables run after forces are reset, for forces the engine doesn't own (e.g. bonds)
+        self.force_providers = []
+        self.kernels = kernels.load(backend)
+        self.neighbor_cells = CellList(1, self.kernels)
+        self.pair_evaluations = 0  # Running total of candidate pairs checked, for throughput reports
+        self.timer = NullTimer()  # Swap for a StageTimer (or a FrameProfiler on the stepping thread) to time each stage of step()
+        self.speed_colors = None  # SpeedColorMap used by update_colors, made on first use
+
+        # By-products of the force pass and walls, read by observables.Observables
+        self.lj_totals = np.zeros(2)  # Lennard-Jones potential energy and virial at the last force evaluation
+        self.spring_totals = np.zeros(2)  # The same for bonds, filled in by whichever force provider owns them
+        self.wall_impulse = 0.0  # Momentum given to the walls so far
+        self.elapsed_time = 0.0  # Simulated seconds stepped so far
+
+        # Optional ParallelForceBackend that takes over the pair stage once there are enough particles
+        self.parallel_backend = None
+        self.parallel_min_particles = 2000
+
+    @property
+    def use_verlet(self):
+        """False only when the original non-Verlet (Euler) update is in use."""
+        return self.integrator.name != integrators.Euler.name
+
+    @use_verlet.setter
+    def use_verlet(self, use_verlet):
+        # Only switch when the value changes, so a chosen Verlet-like integrator isn't replaced
+        if use_verlet != self.use_verlet:
+            self.integrator = integrators.VelocityVerlet() if use_verlet else integrators.Euler()
+
+    @property
+    def periodic_box(self):
+        """Size of the box when it is periodic, as passed to the pair kernels; None with walls."""
+        return np.asarray(self.bounds_size, dtype=float) if self.periodic else None
+
+    @property
+    def backend(self):
+        """Name of the kernel backend in use."""
+        return self.kernels.name
+
+    # Views over the live rows of each array
+    @property
+    def positions(self):
+        return self._positions[:self.count]
+
+    @property
+    def velocities(self):
+        return self._velocities[:self.count]
+
+    @property
+    def forces(self):
+        return self._forces[:self.count]
+
+    @property
+    def radii(self):
+        return self._radii[:self.count]
+
+    @property
+    def colors(self):
+        return self._colors[:self.count]
+
+    @property
+    def potential_energies(self):
+        """Each particle's half of its pairs' Lennard-Jones energy, while track_potential_energies is on."""
+        return self._potential_energies[:self.count]
+
+    @property
+    def lj_cutoff_distance(self):
+        """
+        Lennard-Jones cutoff in reduced distance units (sigma * lj_cutoff). In a
+        periodic box it is held to half the box's shorter side, beyond which a
+        pair's nearest image is no longer the only one within reach.
+        """
+        cutoff = self.lj_cutoff * self.sigma
+        if self.periodic:
+            cutoff = min(cutoff, 0.5 * min(self.bounds_size) / self.scale)
+        return cutoff
+
+    @property
+    def well_depth(self):
+        """Depth of one pair's Lennard-Jones well, in the pixel energy units of lj_totals."""
+        well = np.array([2 ** (1 / 6) * self.sigma])  # Where the pair force is zero
+        return -self.scale * lennard_jones_pair_energies(well, self.epsilon, self.sigma, self.lj_cutoff_distance,
+                                                         self.lj_shifted)[0]
+
+    @property
+    def capacity(self):
+        """Particles the arrays hold before they next grow."""
+        return len(self._radii)
+
+    def adopt_arrays(self, arrays):
+        """
+        Move per-particle arrays into the given ones (by name, e.g. "positions",
+        each with a row per unit of capacity), keeping the live rows. This lets
+        them live in shared memory; arrays grown later are ordinary ones again.
+        """
+        for name, array in arrays.items():
+            current = getattr(self, "_" + name)
+            if current is not array:
+                array[:self.count] = current[:self.count]
+                setattr(self, "_" + name, array)
+
+    def release_arrays(self, arrays):
+        """Copy any per-particle array that is one of `arrays` back into memory of its own."""
+        for name, array in arrays.items():
+            if getattr(self, "_" + name) is array:
+                setattr(self, "_" + name, array.copy())
+
+    def _grow(self):
+        """Double the capacity of every per-particle array."""
+        capacity = max(2 * len(self._radii), 1)
+        for name in ("_positions", "_velocities", "_forces", "_radii", "_colors", "_potential_energies"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add_particle(self, x, y, vx, vy, radius):
+        """Append a particle centred at (x, y) and return its index."""
+        if self.count == len(self._radii):
+            self._grow()
+        index = self.count
+        self.count += 1
+        self._positions[index] = (x, y)
+        self._velocities[index] = (vx, vy)
+        self._forces[index] = 0
+        self._radii[index] = radius
+        return index
+
+    def add_particles(self, positions, velocities, radius):
+        """Append particles from (n, 2) position and velocity arrays, all of one radius; return the first index."""
+        count = len(positions)
+        while self.count + count > len(self._radii):
+            self._grow()
+        start = self.count
+        self.count += count
+        self._positions[start:self.count] = positions
+        self._velocities[start:self.count] = velocities
+        self._forces[start:self.count] = 0
+        self._radii[start:self.count] = radius
+        return start
+
+    def clear(self):
+        self.count = 0
+        self.neighbor_cells.clear()
+
+    def set_bounds(self, pos, size):
+        self.bounds_pos = tuple(pos)
+        self.bounds_size = tuple(size)
+
+    def rescale(self, new_pos, new_size):
+        """
+        Proportionally rescale positions and velocities to new box dimensions.
+        """
+        old_pos = np.asarray(self.bounds_pos, dtype=float)
+        old_size = np.asarray(self.bounds_size, dtype=float)
+        new_pos = np.asarray(new_pos, dtype=float)
+        new_size = np.asarray(new_size, dtype=float)
+
+        self.positions[:] = (self.positions - old_pos) / old_size * new_size + new_pos
+        self.velocities[:] *= new_size / old_size
+
+        self.set_bounds(new_pos, new_size)
+        self.cap_speeds()
+        self.keep_within_bounds()
+
+    def neighbor_cutoff(self):
+        """Largest distance (in pixels) at which two particles can still interact."""
+        cutoff = 2 * self.radii.max() if self.count else 0
+        if self.intermolecular_forces:
+            cutoff = max(cutoff, self.lj_cutoff_distance * self.scale)
+        if self.periodic:
+            cutoff = min(cutoff, 0.5 * min(self.bounds_size))  # Keep at least two cells across the box
+        return max(cutoff, 1)
+
+    def step(self, dt):
+        """
+        Advance the system by one timestep with the current integrator.
+        Colours are left to whoever draws the system (see update_colors).
+        """
+        self.integrator.step(self, dt)
+        self.elapsed_time += dt
+
+    def compute_forces(self, collide=True):
+        """
+        Recompute every force at the current positions.
+        :param collide: Also resolve collisions among the candidate pairs; integrators
+                        evaluating trial positions turn this off.
+        """
+        timer = self.timer
+        with timer.stage("force reset"):
+            self.reset_forces()
+            self.lj_totals[:] = 0
+            self.spring_totals[:] = 0
+            if self.track_potential_energies:
+                self.potential_energies[:] = 0
+        with timer.stage("spring"):
+            for provider in self.force_providers:
+                provider()
+        if (collide and self.parallel_backend is not None and self.count >= self.parallel_min_particles
+                and not self.periodic):
+            with timer.stage("parallel pairs"):
+                self.pair_evaluations += self.parallel_backend.apply(self)
+        else:
+            with timer.stage("neighbors"):
+                first, second = self.neighbor_pairs()
+                self.pair_evaluations += len(first)
+            if collide:
+                with timer.stage("collision"):
+                    self.apply_collisions(first, second)
+            with timer.stage("lennard-jones"):
+                self.apply_lennard_jones(first, second)
+
+    def reset_forces(self):
+        self.forces[:] = 0
+        self.forces[:, 1] = -self.gravity
+
+    def neighbor_pairs(self):
+        """
+        Candidate interacting pairs: all of them for small systems, otherwise
+        from the cell list, wrapped around the box when it is periodic.
+        """
+        cutoff = self.neighbor_cutoff()
+        if self.count <= self.dense_pair_limit:
+            return all_pairs(self.count)
+        self.neighbor_cells.set_cell_size(cutoff)
+        self.neighbor_cells.set_periodic_box(self.bounds_pos, self.bounds_size if self.periodic else None)
+        self.neighbor_cells.update(self.positions)
+        return self.neighbor_cells.pairs()
+
+    def apply_collisions(self, first, second):
+        """Resolve collisions among the candidate pairs."""
+        collided = self.kernels.resolve_collisions(self.positions, self.velocities, self.radii, first, second,
+                                                   self.separate_collisions, self.periodic_box)
+        self.cap_speeds(collided)
+
+    def apply_lennard_jones(self, first, second):
+        """Add Lennard-Jones forces for the candidate pairs, if intermolecular forces are on."""
+        if self.intermolecular_forces:
+            self.kernels.lennard_jones(self.positions, first, second, self.epsilon, self.sigma, self.scale,
+                                       self.lj_cutoff_distance, self.lj_shifted, self.forces, self.lj_totals,
+                                       self.periodic_box,
+                                       self.potential_energies if self.track_potential_energies else None)
+
+    def verlet_drift(self, dt):
+        """First half of velocity Verlet: x += v dt + F dt^2 / 2 and v += F dt / 2, then bounce."""
+        self.speed_cap = self.verlet_speed_cap
+        self.kernels.verlet_drift(self.positions, self.velocities, self.forces, dt)
+        self.kernels.kick(self.velocities, self.forces, dt / 2)
+        self.bounce_off_walls()
+
+    def verlet_kick(self, dt):
+        """Second half of velocity Verlet: v += F dt / 2 with the freshly computed forces."""
+        self.cap_forces()  # Also caps the forces the next drift starts from
+        self.kernels.kick(self.velocities, self.forces, dt / 2)
+        self.cap_speeds()
+
+    def euler_step(self):
+        """The original non-Verlet update: forces are added straight to velocities, with no timestep."""
+        self.speed_cap = self.euler_speed_cap
+        self.kernels.kick(self.velocities, self.forces, 1)
+        self.cap_speeds()
+        self.kernels.kick(self.positions, self.velocities, 1)
+        self.bounce_off_walls()
+        self.cap_speeds()
+
+    def cap_speeds(self, indices=None):
+        """Scale any velocity faster than speed_cap back down to it, for all particles or just `indices`."""
+        if indices is None:
+            clamp_norms(self.velocities, self.speed_cap)
+        elif len(indices):
+            velocities = self.velocities[indices]
+            clamped = clamp_norms(velocities, self.speed_cap)
+            self.velocities[indices[clamped]] = velocities[clamped]
+
+    def cap_forces(self):
+        clamp_norms(self.forces, self.force_cap)
+
+    def bounce_off_walls(self):
+        """
+        Mirror particles that went past a wall back inside and reverse their
+        velocity, or in a periodic box wrap them around to the opposite side.
+        """
+        if self.periodic:
+            self.kernels.wrap(self.positions, self.bounds_pos, self.bounds_size)
+            return
+        self.wall_impulse += self.kernels.bounce_off_walls(self.positions, self.velocities, self.radii,
+                                                           self.bounds_pos, self.bounds_size)
+
+    def keep_within_bounds(self):
+        if self.periodic:
+            self.kernels.wrap(self.positions, self.bounds_pos, self.bounds_size)
+            return
+        self.kernels.keep_within_bounds(self.positions, self.radii, self.bounds_pos, self.bounds_size)
+
+    def wall_limits(self):
+        """Lowest and highest allowed centre coordinates for each particle."""
+        return kernels.wall_limits(self.radii, self.bounds_pos, self.bounds_size)
+
+    def update_colors(self, color_map=None):
+        """
+        Fill `colors` from a colour map of the color_maps module, by default
+        one blending between slow and fast by speed. Not part of step(); call
+        it once per drawn frame, or let the renderer colour the molecules.
+        """
+        if color_map is None:
+            if self.speed_colors is None:
+                self.speed_colors = color_maps.SpeedColorMap(self.color_slow, self.color_fast)
+            color_map = self.speed_colors
+        color_map.colors(self, self.colors)
+
+    def kinetic_energies(self):
+        return 0.5 * (self.velocities ** 2).sum(axis=1)
+
+
+def clamp_norms(vectors, cap):
+    """
+    Scale every row of `vectors` longer than `cap` down to that length, in place.
+    Squared lengths are compared, so only the clamped rows need a square root.
+    :return: Indices of the clamped rows.
+    """
+    squared = np.einsum("ij,ij->i", vectors, vectors)
+    clamped = np.flatnonzero(squared > cap * cap)
+    if len(clamped):
+        vectors[clamped] *= (cap / np.sqrt(squared[clamped]))[:, None]
+    return clamped
@@ -0,0 +1,199 @@
+from collections import deque
+import threading
+import time
+
+import numpy as np
+
+from cell_list import CellList
+from particle_system import ParticleSystem
+from profiler import StageTimer
+
+
+class StateSnapshot:
+    """
+    Copy of the per-particle arrays the UI reads (drawing, bond lines, touch
+    hit-testing, stats), so it never looks at a ParticleSystem mid-step.
+    Touches are hit-tested against a CellList of its own, with the cell size
+    of the physics neighbour grid, brought up to date on the first query
+    after each copy.
+    """
+
+    fields = ("positions", "velocities", "forces", "radii", "potential_energies")
+
+    def __init__(self):
+        self.count = 0
+        self.step_count = 0  # Physics steps taken when the snapshot was copied
+        self.positions = np.zeros((0, 2))
+        self.velocities = np.zeros((0, 2))
+        self.forces = np.zeros((0, 2))
+        self.radii = np.zeros(0)
+        self.potential_energies = np.zeros(0)
+        self.colors = np.zeros((0, 4))  # Not copied from the system; the renderer colours molecules each frame
+        # Scales the colour maps saturate at
+        self.speed_cap = ParticleSystem.verlet_speed_cap
+        self.force_cap = ParticleSystem.force_cap
+        self.well_depth = 1.0
+        self.observables = {}  # Running averages from the thread's Observables, if it has one
+        self.stage_times = {}  # Seconds spent in each stage of step() since the UI last took a snapshot
+        self.cell_size = 1.0  # Cell size of the system's neighbour grid
+        self.cells = CellList()
+        self.cells_current = False
+
+    def copy_from(self, system, step_count=0):
+        """Overwrite this snapshot with the system's live rows, reusing the arrays when the count is unchanged."""
+        self.count = system.count
+        self.step_count = step_count
+        self.cell_size = system.neighbor_cutoff()
+        self.cells_current = False
+        self.speed_cap = system.speed_cap
+        self.force_cap = system.force_cap
+        self.well_depth = system.well_depth
+        for name in self.fields:
+            source = getattr(system, name)
+            target = getattr(self, name)
+            if target.shape != source.shape:
+                target = np.empty_like(source)
+                setattr(self, name, target)
+            np.copyto(target, source)
+
+    def particles_at(self, points, reach):
+        """For each (x, y) in `points`, the index of the nearest particle within `reach` of it, or -1."""
+        if not self.cells_current:
+            # Cells at least as large as the reach keep every query to the 3x3 cells around it
+            self.cells.set_cell_size(max(self.cell_size, reach))
+            self.cells.update(self.positions)
+            self.cells_current = True
+        elif reach > self.cells.cell_size:
+            self.cells.set_cell_size(reach)
+            self.cells.update(self.positions)
+        return self.cells.nearest(self.positions, points, reach)
+
+    # Read-only queries shared with ParticleSystem
+    kinetic_energies = ParticleSystem.kinetic_energies
+
+
+class PhysicsThread(threading.Thread):
+    """
+    Steps a ParticleSystem on its own thread so a slow step never blocks the
+    Kivy frame. Each batch of steps is copied into a back buffer; the UI calls
+    swap() once per frame to pick up the newest one. An optional Observables
+    is sampled after every step, each sample going to an optional Recorder,
+    and its averages travel with the snapshot, as do the step's stage timings.
+
+    The system and scheduler belong to this thread once it starts. Everything
+    else changes them through submit(), which appends to a deque (atomic, so
+    no lock is taken) that the thread drains before each batch of steps.
+    """
+
+    def __init__(self, system, scheduler, observables=None, recorder=None):
+        super().__init__(name="physics", daemon=True)
+        self.system = system
+        self.scheduler = scheduler
+        self.observables = observables
+        self.recorder = recorder
+        self.commands = deque()
+        self.wake = threading.Event()
+        self.running = False  # Whether time advances; commands are still applied while paused
+        self.stopped = False
+        self.step_count = 0
+        self.busy_time = 0.0  # Wall-clock seconds spent stepping so far, for the UI's frame-time budget
+        # Times the stages of every step on this thread; the totals are handed over with each snapshot
+        self.timer = StageTimer()
+        system.timer = self.timer
+        self.last_time = time.perf_counter()
+
+        # Double buffer: the thread fills `back`, swap() hands it to the UI as `front`
+        self.front = StateSnapshot()
+        self.back = StateSnapshot()
+        self.fresh = False
+        self.swap_lock = threading.Lock()  # Held only to copy into `back` or exchange the two buffers
+
+    def submit(self, command, *args):
+        """Queue `command(*args)` to run on the physics thread before its next step."""
+        self.commands.append((command, args))
+        self.wake.set()
+
+    def resume(self):
+        self.submit(self._set_running, True)
+
+    def pause(self):
+        self.submit(self._set_running, False)
+
+    def stop(self):
+        """End the thread after its current batch of steps."""
+        self.stopped = True
+        self.wake.set()
+        if self.is_alive():
+            self.join()
+
+    def swap(self):
+        """
+        Called from the UI thread: make the newest published state `front`.
+        :return: True if there was a new state since the last swap.
+        """
+        with self.swap_lock:
+            if not self.fresh:
+                return False
+            self.front, self.back = self.back, self.front
+            self.fresh = False
+            return True
+
+    def _set_running(self, running):
+        if running and not self.running:
+            self.scheduler.reset()
+            self.last_time = time.perf_counter()
+        self.running = running
+
+    def run_commands(self):
+        """Apply every queued command; return whether there were any."""
+        ran = False
+        while self.commands:
+            command, args = self.commands.popleft()
+            command(*args)
+            ran = True
+        return ran
+
+    def record(self):
+        """Sample the observables after a step and keep the sample in the recorder."""
+        if self.observables is None:
+            return
+        if self.recorder is None:
+            self.observables.sample(self.system)
+            return
+        # Measured straight into the recorder's next row, so no sample allocates an array
+        self.observables.sample(self.system, out=self.recorder.next_values())
+        self.recorder.append_row(self.system.elapsed_time)
+
+    def publish(self):
+        with self.swap_lock:
+            if not self.fresh:
+                self.back.stage_times = {}  # The UI has taken the timings already in this buffer
+            for name, seconds in self.timer.totals.items():
+                self.back.stage_times[name] = self.back.stage_times.get(name, 0.0) + seconds
+            self.timer.reset()
+            self.back.copy_from(self.system, self.step_count)
+            if self.observables is not None:
+                self.back.observables = self.observables.averages()
+            self.fresh = True
+
+    def run(self):
+        self.publish()
+        while not self.stopped:
+            self.wake.clear()
+            changed = self.run_commands()
+
+            steps = 0
+            if self.running:
+                now = time.perf_counter()
+                steps = self.scheduler.advance(now - self.last_time)
+                self.last_time = now
+                for _ in range(steps):
+                    self.system.step(self.scheduler.step_size)
+                    self.record()
+                self.step_count += steps
+                self.busy_time += time.perf_counter() - now
+
+            if steps or changed:
+                self.publish()
+            # Sleep until the next step is due, or indefinitely while paused; submit() and stop() wake it early
+            self.wake.wait(self.scheduler.time_until_next_step() if self.running else None)
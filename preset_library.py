@@ -0,0 +1,214 @@
+"""
+Library of pre-equilibrated preset arrangements, so choosing a preset loads
+an already relaxed state instead of starting with seconds of violent
+Lennard-Jones relaxation.
+
+Each entry is an .npz file in `directory`, named after its preset, particle
+count, box size in pixels, epsilon and sigma. The forces act over fixed pixel
+distances, so a state relaxed in one box is far from equilibrium in a much
+different one; an entry is only used for boxes within `size_tolerance` of the
+one it was built in, its positions stretched to fit. An entry holds a few
+snapshots of the equilibrated run, as float32 pixel positions and velocities. Build or refresh entries with a headless equilibration run:
+
+    python -m preset_library --preset Solid Liquid Gas --steps 3000
+"""
+import argparse
+import copy
+import glob
+import os
+import random
+
+import numpy as np
+
+import headless
+import presets
+
+directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preset_library")
+
+# Temperature (mean kinetic energy per molecule, as in observables) each preset is equilibrated at.
+# The fluids keep their generators' velocity spread, uniform(-a, a) giving a^2 / 3; the solid is cooled nearly still.
+temperatures = {"Solid": 20.0, "Liquid": 50 ** 2 / 3, "Gas": 200 ** 2 / 3}
+fluid_presets = ("Liquid", "Gas")  # Loaded with a random mirror image and fresh velocities, as they'd be generated
+size_tolerance = 0.1  # Largest relative difference in width or height between an entry's box and the one it's loaded in
+
+
+def entry_path(name, count, size, epsilon, sigma):
+    """Path of the library entry for a preset with these parameters in a box of `size` pixels."""
+    width, height = (int(round(length)) for length in size)
+    return os.path.join(directory, f"{name.lower()}_{count}_{width}x{height}_eps{epsilon:.2f}_sig{sigma:.2f}.npz")
+
+
+def closest_entry(name, count, size, epsilon, sigma):
+    """
+    Path and box size of the library entry for these parameters whose box is
+    closest to `size`, if within size_tolerance along both sides, else (None, None).
+    """
+    size = np.asarray(size, dtype=float)
+    pattern = os.path.join(directory, f"{name.lower()}_{count}_*x*_eps{epsilon:.2f}_sig{sigma:.2f}.npz")
+    best, best_size, best_difference = None, None, size_tolerance
+    for path in glob.glob(pattern):
+        box = os.path.basename(path)[len(f"{name.lower()}_{count}_"):].split("_", 1)[0]
+        try:
+            entry_size = np.array([float(length) for length in box.split("x")])
+        except ValueError:
+            continue
+        difference = np.abs(entry_size / np.maximum(size, 1) - 1).max()
+        if difference <= best_difference:
+            best, best_size, best_difference = path, entry_size, difference
+    return best, best_size
+
+
+def load(name, epsilon, sigma, size, size_factor=presets.default_size_factor, count=None):
+    """
+    The library entry for a preset in a box of `size` pixels, as a dict of
+    its arrays, or None if there is none for these parameters and a box within
+    size_tolerance of this one, or it was equilibrated with a different
+    molecule size. An entry built in a slightly different box has its
+    positions stretched to this one, and its "size" set to it.
+    `count` defaults to the preset's own number of molecules.
+    """
+    count = presets.counts[name] if count is None else count
+    path, entry_size = closest_entry(name, count, size, epsilon, sigma)
+    if path is None:
+        return None
+    with np.load(path) as entry:
+        if not np.isclose(entry["size_factor"], size_factor):
+            return None
+        entry = dict(entry)
+    size = np.asarray(size, dtype=float)
+    if not np.allclose(entry_size, size, atol=0.5):
+        entry["positions"] = (entry["positions"] * (size / entry["size"])).astype(np.float32)
+        entry["size"] = size
+    return entry
+
+
+def place(entry, pos, randomize=False, rng=None):
+    """
+    (positions, velocities) of a loaded entry, in a layout whose bottom-left
+    corner is at `pos`. One of the entry's snapshots is used.
+    :param randomize: Pick the snapshot at random, mirror it at random across
+                      either axis of the box and draw fresh velocities with the
+                      same kinetic energy, so a fluid doesn't load the same way
+                      every time.
+    """
+    snapshots = len(entry["positions"])
+    rng = np.random.default_rng() if rng is None and randomize else rng
+    snapshot = rng.integers(snapshots) if randomize else snapshots - 1
+    positions = entry["positions"][snapshot].astype(float)
+    velocities = entry["velocities"][snapshot].astype(float)
+
+    if randomize:
+        size = np.asarray(entry["size"], dtype=float)
+        for axis in range(2):
+            if rng.random() < 0.5:
+                positions[:, axis] = size[axis] - positions[:, axis]
+        kinetic = np.einsum("ij,ij->", velocities, velocities)
+        velocities = rng.normal(size=velocities.shape)
+        velocities -= velocities.mean(axis=0)
+        velocities *= np.sqrt(kinetic / max(np.einsum("ij,ij->", velocities, velocities), 1e-12))
+    return positions + np.asarray(pos, dtype=float), velocities
+
+
+def temperature_of(system):
+    """Mean kinetic energy per molecule."""
+    return 0.5 * np.einsum("ij,ij->", system.velocities, system.velocities) / max(system.count, 1)
+
+
+def equilibrate(system, steps, temperature, delta=1 / 60.0, relaxation_time=0.5):
+    """
+    Step the system with a Berendsen thermostat pulling its temperature (mean
+    kinetic energy per molecule) towards `temperature`, so the energy the
+    Lennard-Jones relaxation releases is taken out rather than heating it.
+    """
+    for _ in range(steps):
+        system.step(delta)
+        current = temperature_of(system)
+        if current > 0:
+            system.velocities[:] *= np.sqrt(max(1 + delta / relaxation_time * (temperature / current - 1), 0))
+
+
+def check_convergence(system, temperature, steps=300, tolerance=0.25, delta=1 / 60.0):
+    """
+    Run a copy of the system with no thermostat and see whether it stays at
+    `temperature`: the mean over the run, and the drift between its first and
+    last thirds, must both be within `tolerance` of it. A state that hasn't
+    relaxed keeps turning potential energy into heat and fails.
+    :return: (converged, mean temperature, drift)
+    """
+    trial = copy.deepcopy(system)
+    samples = []
+    for _ in range(steps):
+        trial.step(delta)
+        samples.append(temperature_of(trial))
+    third = max(steps // 3, 1)
+    mean = float(np.mean(samples))
+    drift = float(np.mean(samples[-third:]) - np.mean(samples[:third]))
+    converged = abs(mean - temperature) <= tolerance * temperature and abs(drift) <= tolerance * temperature
+    return converged, mean, drift
+
+
+def build(name, epsilon=1.0, sigma=1.0, size_factor=presets.default_size_factor, steps=3000,
+          width=1536, height=648, samples=4, sample_interval=120, check_interval=500, log=print):
+    """
+    Equilibrate a preset headless at its temperature until check_convergence
+    passes, then record `samples` snapshots `sample_interval` steps apart and
+    save them to the library.
+    :return: The entry's path.
+    :raises RuntimeError: If the state hasn't converged after `steps` steps; nothing is written.
+    """
+    system = headless.build_system(name, width, height, size_factor, epsilon=epsilon, sigma=sigma)
+    temperature = temperatures[name]
+    converged = False
+    done = 0
+    while done < steps and not converged:
+        equilibrate(system, min(check_interval, steps - done), temperature)
+        done += min(check_interval, steps - done)
+        converged, mean, drift = check_convergence(system, temperature)
+        log(f"{name}: {done} steps, unthermostatted temperature {mean:.1f} (target {temperature:.1f}, "
+            f"drift {drift:+.1f})")
+    if not converged:
+        raise RuntimeError(f"{name} did not settle at temperature {temperature:.1f} within {steps} steps; "
+                           f"no library entry was written")
+
+    positions = []
+    velocities = []
+    for _ in range(samples):
+        equilibrate(system, sample_interval, temperature)
+        positions.append(system.positions.astype(np.float32))
+        velocities.append(system.velocities.astype(np.float32))
+
+    os.makedirs(directory, exist_ok=True)
+    path = entry_path(name, system.count, (width, height), epsilon, sigma)
+    np.savez(path, positions=np.stack(positions), velocities=np.stack(velocities),
+             size=np.array([width, height], dtype=float), size_factor=size_factor, temperature=temperature,
+             steps=done)
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Equilibrate presets headless and store them in the preset library.")
+    parser.add_argument("--preset", nargs="+", choices=sorted(presets.generators), default=sorted(presets.generators))
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--sigma", type=float, default=1.0)
+    parser.add_argument("--size-factor", type=float, default=presets.default_size_factor)
+    parser.add_argument("--width", type=int, default=1536, help="Width of the game area the entry is for, in pixels")
+    parser.add_argument("--height", type=int, default=648, help="Height of the game area the entry is for, in pixels")
+    parser.add_argument("--steps", type=int, default=3000, help="Most equilibration steps of 1/60 s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the Liquid and Gas layouts")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for name in args.preset:
+        random.seed(args.seed)
+        try:
+            path = build(name, args.epsilon, args.sigma, args.size_factor, args.steps, args.width, args.height)
+        except RuntimeError as error:
+            print(error)
+            continue
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
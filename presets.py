@@ -0,0 +1,66 @@
+from random import uniform
+
+molecule_radius_ratio = 0.03  # Molecule radius as a fraction of the layout width, before the size factor
+default_size_factor = 0.6
+solid_rows, solid_cols = 11, 25
+liquid_count = 50
+gas_count = 15
+
+
+def molecule_radius(width, size_factor=default_size_factor):
+    """Radius of a molecule in a layout `width` pixels wide."""
+    return width * molecule_radius_ratio * size_factor
+
+
+def solid(pos, size):
+    """Return (x, y, vx, vy) for a solid-like grid of molecules at rest."""
+    rows, cols = solid_rows, solid_cols
+    spacing_x = size[0] * 0.039
+    spacing_y = size[1] * 0.09
+    start_x = pos[0] + spacing_x
+    start_y = pos[1] + spacing_y
+
+    molecules = []
+    for row in range(rows):
+        for col in range(cols):
+            x = start_x + col * spacing_x
+            y = start_y + row * spacing_y
+            molecules.append((x, y, 0, 0))
+    return molecules
+
+
+def liquid(pos, size):
+    """Return (x, y, vx, vy) for a liquid-like scatter of molecules."""
+    molecules = []
+    for _ in range(liquid_count):
+        x = uniform(pos[0] + 50, pos[0] + size[0] - 50)
+        y = uniform(pos[1] + 50, pos[1] + size[1] - 50)
+        vx = uniform(-50, 50)
+        vy = uniform(-50, 50)
+        molecules.append((x, y, vx, vy))
+    return molecules
+
+
+def gas(pos, size):
+    """Return (x, y, vx, vy) for a gas-like scatter of fast molecules."""
+    molecules = []
+    for _ in range(gas_count):
+        x = uniform(pos[0] + 50, pos[0] + size[0] - 50)
+        y = uniform(pos[1] + 50, pos[1] + size[1] - 50)
+        vx = uniform(-200, 200)
+        vy = uniform(-200, 200)
+        molecules.append((x, y, vx, vy))
+    return molecules
+
+
+generators = {
+    "Solid": solid,
+    "Liquid": liquid,
+    "Gas": gas,
+}
+
+counts = {
+    "Solid": solid_rows * solid_cols,
+    "Liquid": liquid_count,
+    "Gas": gas_count,
+}
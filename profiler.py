@@ -0,0 +1,123 @@
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import csv
+import json
+import time
+
+import numpy as np
+
+
+class NullTimer:
+    """Stand-in timer that records nothing, so untimed code pays almost no overhead."""
+
+    def stage(self, name):
+        return nullcontext()
+
+
+class StageTimer:
+    """Accumulates the wall-clock time spent in each named stage."""
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+
+
+class FrameProfiler:
+    """
+    Times each stage of a frame and keeps the last `window` frames, so rolling
+    percentiles show where frame time goes without an external profiler.
+    Stages entered several times in one frame are summed.
+    """
+
+    def __init__(self, window=300):
+        self.window = window
+        self.frames = deque(maxlen=window)  # Per-frame {stage: seconds}, oldest first
+        self.current = {}
+        self.frame_start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + time.perf_counter() - start
+
+    def add_stages(self, stages):
+        """Add {stage: seconds} timed elsewhere, e.g. on the physics thread, to the current frame."""
+        for name, seconds in stages.items():
+            self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def restart_frame(self):
+        """Discard the frame in progress, e.g. after the simulation was paused."""
+        self.current = {}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Close the current frame, recording its stages and total wall time."""
+        now = time.perf_counter()
+        self.current["frame"] = now - self.frame_start
+        self.frames.append(self.current)
+        self.current = {}
+        self.frame_start = now
+
+    def stage_names(self):
+        names = []
+        for frame in self.frames:
+            names.extend(name for name in frame if name not in names)
+        return names
+
+    def percentiles(self, name, quantiles=(50, 95, 99)):
+        """Percentiles (in seconds) of a stage's time over the recorded frames."""
+        samples = [frame.get(name, 0.0) for frame in self.frames]
+        if not samples:
+            return [0.0 for _ in quantiles]
+        return np.percentile(samples, quantiles).tolist()
+
+    def summary(self):
+        """{stage: {"mean", "p50", "p95", "p99"}} in milliseconds."""
+        summary = {}
+        for name in self.stage_names():
+            samples = [frame.get(name, 0.0) for frame in self.frames]
+            p50, p95, p99 = self.percentiles(name)
+            summary[name] = {
+                "mean": 1000 * sum(samples) / len(samples),
+                "p50": 1000 * p50,
+                "p95": 1000 * p95,
+                "p99": 1000 * p99,
+            }
+        return summary
+
+    def report(self):
+        """Multi-line text table of the summary, for the overlay or a console."""
+        lines = [f"{'stage':<14}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<14}{stats['p50']:>8.2f}{stats['p95']:>8.2f}{stats['p99']:>8.2f}")
+        return "\n".join(lines)
+
+    def dump_csv(self, path):
+        """Write one row per recorded frame with the seconds spent in each stage."""
+        names = self.stage_names()
+        with open(path, "w", newline="") as output:
+            writer = csv.writer(output)
+            writer.writerow(["index"] + names)
+            for index, frame in enumerate(self.frames):
+                writer.writerow([index] + [frame.get(name, 0.0) for name in names])
+
+    def dump_json(self, path):
+        """Write the percentile summary plus every recorded frame."""
+        with open(path, "w") as output:
+            json.dump({"summary_ms": self.summary(), "frames": list(self.frames)}, output, indent=2)
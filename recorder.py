@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class Recorder:
+    """
+    Fixed-capacity ring buffer of samples: a time column plus one column per
+    field, preallocated so recording a sample is a single row write. Once
+    full, the oldest samples are overwritten. One thread appends; others may
+    read at any time, copying out what they need.
+    """
+
+    def __init__(self, fields, capacity=3600):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.data = np.zeros((capacity, len(self.fields) + 1))
+        self.count = 0  # Samples held, up to capacity
+        self.next = 0  # Row the next sample goes in
+
+    def __len__(self):
+        return self.count
+
+    def append(self, time, values):
+        """Record one sample; `values` are in the order of `fields`."""
+        self.next_values()[:] = values
+        self.append_row(time)
+
+    def next_values(self):
+        """View of the field values of the row the next sample goes in, to be written before append_row."""
+        return self.data[self.next, 1:]
+
+    def append_row(self, time):
+        """Record the sample whose values were written into next_values(), at `time`."""
+        self.data[self.next, 0] = time
+        # Publish the row only after it is written, for readers on other threads
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def clear(self):
+        self.count = 0
+        self.next = 0
+
+    def chronological(self, values):
+        """Copy of the recorded rows of `values` (data or one of its columns), oldest first."""
+        count, next_row = self.count, self.next
+        if count < self.capacity:
+            return values[:count].copy()
+        return np.concatenate((values[next_row:], values[:next_row]))
+
+    def column(self, name):
+        """Recorded values of one field, or "time", oldest first."""
+        index = 0 if name == "time" else self.fields.index(name) + 1
+        return self.chronological(self.data[:, index])
+
+    def to_array(self):
+        """(samples, 1 + fields) array of time and every field, oldest first."""
+        return self.chronological(self.data)
+
+    def export_csv(self, path):
+        np.savetxt(path, self.to_array(), delimiter=",", header=",".join(("time",) + self.fields), comments="")
+
+    def export_npz(self, path):
+        """Write one named array per column to a compressed .npz file."""
+        samples = self.to_array()
+        np.savez_compressed(path, time=samples[:, 0],
+                            **{name: samples[:, index + 1] for index, name in enumerate(self.fields)})
@@ -0,0 +1,54 @@
+class FixedTimestepScheduler:
+    """
+    Decouples physics time from how often the Clock fires. Wall-clock time is
+    converted to simulated time and collected in an accumulator, which is then
+    spent in whole physics steps of a fixed size, so frame hitches no longer
+    slow the simulation down.
+    """
+
+    def __init__(self, frame_step=1 / 60.0, time_scale=1.0, substeps=1, max_catchup_frames=4):
+        """
+        :param frame_step: Simulated time covered by one nominal rendered frame.
+        :param time_scale: Simulated seconds per wall-clock second.
+        :param substeps: Physics steps each frame step is split into.
+        :param max_catchup_frames: Most frames' worth of steps run in one call before
+                                   the backlog is dropped instead of spiralling.
+        """
+        self.frame_step = frame_step
+        self.time_scale = time_scale
+        self.substeps = substeps
+        self.max_catchup_frames = max_catchup_frames
+        self.accumulator = 0.0
+
+    @property
+    def step_size(self):
+        """Simulated time advanced by each physics step."""
+        return self.frame_step / self.substeps
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """
+        Add `elapsed` wall-clock seconds and return how many physics steps of
+        `step_size` should run now.
+        """
+        if self.step_size <= 0:
+            return 0
+
+        self.accumulator += elapsed * self.time_scale
+        steps = int(self.accumulator / self.step_size + 1e-9)  # Tolerate rounding just below a whole step
+
+        max_steps = self.substeps * self.max_catchup_frames
+        if steps > max_steps:
+            steps = max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator = max(self.accumulator - steps * self.step_size, 0.0)
+        return steps
+
+    def time_until_next_step(self):
+        """Wall-clock seconds until the accumulator holds another whole step, or None if time is stopped."""
+        if self.step_size <= 0 or self.time_scale <= 0:
+            return None
+        return max(self.step_size - self.accumulator, 0.0) / self.time_scale
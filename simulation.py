@@ -17,6 +17,8 @@ from TextBlurb import TextBlurb
 from CustomSlider import CustomSlider
 from SliderBox import SliderBox
 from SpinnerBox import SpinnerBox
+from ProfilerOverlay import ProfilerOverlay
+from Sparkline import Sparkline
 
 class WindowManager(ScreenManager):
     pass
@@ -112,6 +114,8 @@ class GameScreen(Screen):
         root.add_widget(ui_panel)
         root.add_widget(bottom_row)
         self.add_stat_labels(root)
+        self.add_sparklines(root)
+        self.add_profiler_overlay(root)
         
         self.lennard_jones_text = TextBlurb(text="Lennard-Jones potential: a simple mathematical model that describes the attractive and repulsive forces between atoms or molecules, like how they pull towards each other at a moderate distance but push away when very close.",
                                             parent_size_prop=(0.15, 0.07),
@@ -315,8 +319,7 @@ class GameScreen(Screen):
 
     def clear_game_area(self):
         """Clear the game area of all molecules and bonds."""
-        self.game_area.clear_widgets()
-        self.game_area.molecules.clear()
+        self.game_area.clear_molecules()
         self.game_area.clear_bonds()
 
     # def create_forces_switch(self):
@@ -347,6 +350,17 @@ class GameScreen(Screen):
         root.add_widget(self.game_area.temperature_label)
         root.add_widget(self.game_area.pressure_label)
 
+    def add_sparklines(self, root):
+        """Add a live plot of each stat's recent history under its label (L dumps the history)."""
+        for field, center_x in (("total_energy", 0.18), ("temperature", 0.51), ("virial_pressure", 0.84)):
+            root.add_widget(Sparkline(self.game_area.recorder, field, size_hint=(0.15, 0.04),
+                                      pos_hint={'center_x': center_x, 'center_y': 0.9}))
+
+    def add_profiler_overlay(self, root):
+        """Add the frame profiler overlay (P to show/hide, O to dump) over the top-left of the game area."""
+        self.game_area.profiler_overlay = ProfilerOverlay(self.game_area.profiler, governor=self.game_area.governor, size_hint=(0.25, 0.25), pos_hint={'x': 0.1, 'top': 0.9})
+        root.add_widget(self.game_area.profiler_overlay)
+
 
 class MyApp(App):
     
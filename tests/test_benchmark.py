@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import benchmark
+
+
+def test_scaling_exponent_recovers_a_power_law():
+    counts = [100, 1000, 10000]
+    assert benchmark.scaling_exponent(counts, [2e-6 * count ** 1.5 for count in counts]) == pytest.approx(1.5)
+    assert benchmark.scaling_exponent([100], [0.1]) is None
+
+
+def test_systems_are_seeded_at_the_reference_density():
+    system = benchmark.build_system(100, 3, True, True)
+    again = benchmark.build_system(100, 3, True, True)
+    np.testing.assert_array_equal(system.positions, again.positions)
+    np.testing.assert_array_equal(system.velocities, again.velocities)
+
+    width, height = system.bounds_size
+    reference_density = benchmark.reference_count / np.prod(benchmark.reference_size)
+    assert system.count / (width * height) == pytest.approx(reference_density)
+    assert len(system.force_providers) == 1  # The bond chain
+
+
+def test_suite_reports_every_configuration():
+    report = benchmark.run_suite([20, 40], min_steps=2, min_time=0, backend="numpy", integrator_names=("verlet",),
+                                 log=lambda message: None)
+    assert len(report["results"]) == 2 * 2 * 2  # Forces on/off, bonds on/off, two counts
+    assert len(report["scaling"]) == 4
+    for result in report["results"]:
+        assert result["steps"] >= 2
+        assert result["seconds_per_step"] == pytest.approx(sum(result["stage_seconds_per_step"].values()))
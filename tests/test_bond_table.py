@@ -0,0 +1,37 @@
+import numpy as np
+
+from bond_table import BondTable
+
+
+def test_removal_moves_the_last_bond_into_the_freed_row():
+    bonds = BondTable(capacity=2)  # Grows while adding
+    for first, second, stiffness in ((0, 1, 10.0), (5, 2, 20.0), (3, 4, 30.0), (7, 6, 40.0)):
+        assert bonds.add(first, second, stiffness, 2.0)
+    assert not bonds.add(1, 0, 99.0, 2.0)
+
+    assert bonds.remove(2, 5)
+    assert not bonds.remove(5, 2)
+    assert len(bonds) == 3
+    # The last bond (6, 7) now sits in row 1, and the table still finds it from either end
+    assert (int(bonds.first[1]), int(bonds.second[1])) == (6, 7)
+    assert bonds.stiffnesses[1] == 40.0
+    assert bonds.rows[(6, 7)] == 1
+    assert (7, 6) in bonds and (2, 5) not in bonds
+
+    assert bonds.remove(6, 7)
+    assert bonds.remove(3, 4)  # The last row itself
+    assert list(bonds) == [(0, 1)]
+    np.testing.assert_array_equal(bonds.first, [0])
+    np.testing.assert_array_equal(bonds.stiffnesses, [10.0])
+
+
+def test_spring_forces_follow_the_remaining_bonds():
+    positions = np.array([[0.0, 0.0], [3.0, 0.0], [0.0, 5.0]])
+    bonds = BondTable()
+    bonds.add(0, 1, 2.0, 1.0)
+    bonds.add(2, 0, 1.0, 1.0)
+    bonds.remove(0, 2)
+    forces = np.zeros_like(positions)
+    bonds.apply(positions, forces)
+    # Only the (0, 1) spring is left: stretched by 2, it pulls both ends together
+    np.testing.assert_allclose(forces, [[4.0, 0.0], [-4.0, 0.0], [0.0, 0.0]])
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from cell_list import CellList
+import kernels
+from forces import all_pairs, minimum_image
+
+
+def pair_set(first, second):
+    return set(zip(np.minimum(first, second).tolist(), np.maximum(first, second).tolist()))
+
+
+@pytest.mark.parametrize("size", [(1536, 648), (600, 500), (1000, 1000)])
+def test_periodic_pairs_cover_every_pair_within_reach_once(size):
+    """Boxes down to two cells across must still give each pair within the cell size exactly once."""
+    cell_size = 250.0
+    rng = np.random.default_rng(1)
+    positions = rng.uniform((0, 0), size, (400, 2))
+    cells = CellList(cell_size)
+    cells.set_periodic_box((0, 0), size)
+    cells.update(positions)
+    first, second = cells.pairs()
+
+    assert len(pair_set(first, second)) == len(first)
+    assert not (first == second).any()
+    every_first, every_second = all_pairs(len(positions))
+    offsets = minimum_image(positions[every_first] - positions[every_second], np.asarray(size, dtype=float))
+    within = np.hypot(offsets[:, 0], offsets[:, 1]) <= cell_size
+    assert pair_set(every_first[within], every_second[within]) <= pair_set(first, second)
+
+
+def test_pairs_cover_every_pair_within_reach_once_as_particles_move():
+    """Re-binning after a move must drop stale buckets; a stray particle far away must not blow up the grid."""
+    cell_size = 60.0
+    rng = np.random.default_rng(2)
+    positions = rng.uniform((0, 0), (900, 400), (500, 2))
+    positions[0] = (1e9, -1e9)
+    cells = CellList(cell_size)
+    for _ in range(3):
+        cells.update(positions)
+        first, second = cells.pairs()
+
+        assert len(pair_set(first, second)) == len(first)
+        assert not (first == second).any()
+        every_first, every_second = all_pairs(len(positions))
+        offsets = positions[every_first] - positions[every_second]
+        within = np.hypot(offsets[:, 0], offsets[:, 1]) <= cell_size
+        assert pair_set(every_first[within], every_second[within]) <= pair_set(first, second)
+        positions[1:] += rng.normal(0, 20, (len(positions) - 1, 2))
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(3)
+    positions = rng.uniform((0, 0), (800, 600), (300, 2))
+    points = rng.uniform((-50, -50), (850, 650), (200, 2))
+    reach = 30.0
+    cells = CellList(25.0)
+    cells.update(positions)
+
+    distances = np.hypot(*(points[:, None, :] - positions[None, :, :]).transpose(2, 0, 1))
+    expected = np.where(distances.min(axis=1) <= reach, distances.argmin(axis=1), -1)
+    np.testing.assert_array_equal(cells.nearest(positions, points, reach), expected)
+
+
+@pytest.mark.parametrize("backend", sorted(kernels.backends))
+@pytest.mark.parametrize("size", [None, (600, 500), (1536, 648)])
+def test_kernel_backends_bin_and_pair_alike(backend, size):
+    rng = np.random.default_rng(4)
+    positions = rng.uniform((0, 0), size or (1200, 700), (700, 2))
+    reference = CellList(250.0)
+    cells = CellList(250.0, kernels.load(backend))
+    for grid in (reference, cells):
+        if size is not None:
+            grid.set_periodic_box((0, 0), size)
+        grid.update(positions)
+
+    np.testing.assert_array_equal(cells.cell_ids, reference.cell_ids)
+    np.testing.assert_array_equal(cells.starts, reference.starts)
+    np.testing.assert_array_equal(cells.order, reference.order)
+    for column_range in (None, (1, 2)):
+        first, second = cells.pairs(column_range)
+        assert len(pair_set(first, second)) == len(first)
+        assert pair_set(first, second) == pair_set(*reference.pairs(column_range))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import color_maps
+from physics_thread import StateSnapshot
+
+
+def test_lookup_table_blends_between_the_end_colours():
+    table = color_maps.lookup_table((0, 0, 0, 255), (255, 51, 102, 255), size=5)
+    assert table.shape == (5, 4) and table.dtype == np.float32
+    np.testing.assert_allclose(table[0], [0, 0, 0, 1])
+    np.testing.assert_allclose(table[-1], [1, 0.2, 0.4, 1])
+    np.testing.assert_allclose(table[2], [0.5, 0.1, 0.2, 1], rtol=1e-6)
+
+
+def test_speed_map_indexes_by_squared_speed_and_clips_to_the_ends():
+    state = StateSnapshot()
+    state.speed_cap = 100.0
+    state.velocities = np.array([[0.0, 0.0], [30.0, 40.0], [100.0, 0.0], [300.0, 400.0]])
+    color_map = color_maps.create("speed", (0, 0, 0, 255), (255, 255, 255, 255))
+    colors = color_map.colors(state, np.zeros((4, 4), dtype=np.float32))
+
+    np.testing.assert_allclose(colors[0], color_map.table[0])
+    np.testing.assert_allclose(colors[2], color_map.table[-1])
+    np.testing.assert_allclose(colors[3], color_map.table[-1])  # Past the cap
+    # Half the cap is a quarter of the squared range; the square-root curve brings it back to halfway
+    np.testing.assert_allclose(colors[1, :3], 0.5, atol=0.01)
+
+
+@pytest.mark.parametrize("name", sorted(color_maps.color_maps))
+def test_maps_fill_buffers_of_any_float_dtype(name):
+    rng = np.random.default_rng(0)
+    state = StateSnapshot()
+    state.velocities = rng.normal(0, 200, (50, 2))
+    state.forces = rng.normal(0, 5000, (50, 2))
+    state.potential_energies = rng.normal(0, 2, 50)
+    color_map = color_maps.create(name)
+    single = color_map.colors(state, np.zeros((50, 4), dtype=np.float32))
+    double = color_map.colors(state, np.zeros((50, 4)))
+    np.testing.assert_allclose(double, single)
+    assert ((single >= 0) & (single <= 1)).all()
+
+
+def test_unknown_map_is_rejected():
+    with pytest.raises(ValueError):
+        color_maps.create("charge")
@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+
+from cell_list import CellList
+from forces import all_pairs, lennard_jones_forces
+import kernels
+
+scale = 10 ** 2
+
+
+def reference_forces(positions, epsilon, sigma, cutoff=None):
+    """The original per-pair formula of Molecule.lennard_jones_force, summed over every pair."""
+    forces = np.zeros_like(positions)
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            dx, dy = positions[i] - positions[j]
+            distance = math.hypot(dx, dy)
+            r = distance / scale
+            if r == 0 or (cutoff is not None and r > cutoff):
+                continue
+            magnitude = 1000 * epsilon * ((2 * (sigma / r) ** 12) - ((sigma / r) ** 6)) / r ** 2
+            force = np.array([dx, dy]) / distance * magnitude
+            forces[i] += force
+            forces[j] -= force
+    return forces
+
+
+def jittered_grid(rows=8, cols=10, spacing=110.0, jitter=25.0, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid(np.arange(cols) * spacing, np.arange(rows) * spacing)
+    positions = np.column_stack([x.ravel(), y.ravel()]) + 100
+    return positions + rng.uniform(-jitter, jitter, positions.shape)
+
+
+def assert_forces_close(forces, expected):
+    # Relative to the largest force, as near pairs dominate and far ones are tiny
+    np.testing.assert_allclose(forces, expected, rtol=1e-6, atol=1e-9 * np.abs(expected).max())
+
+
+@pytest.mark.parametrize("epsilon, sigma", [(1.0, 1.0), (2.5, 0.8), (0.3, 1.4)])
+def test_all_pairs_match_per_pair_formula(epsilon, sigma):
+    positions = jittered_grid()
+    forces = lennard_jones_forces(positions, None, None, epsilon, sigma, scale)
+    assert_forces_close(forces, reference_forces(positions, epsilon, sigma))
+
+
+def test_cutoff_matches_per_pair_formula_over_cell_list_pairs():
+    positions = jittered_grid()
+    cutoff = 2.5
+    cells = CellList(cutoff * scale)
+    cells.update(positions)
+    first, second = cells.pairs()
+    forces = lennard_jones_forces(positions, first, second, 1.0, 1.0, scale, cutoff=cutoff)
+    assert_forces_close(forces, reference_forces(positions, 1.0, 1.0, cutoff))
+
+
+def test_coincident_particles_exert_no_force():
+    positions = np.array([[100.0, 100.0], [100.0, 100.0], [250.0, 100.0]])
+    forces = lennard_jones_forces(positions, None, None, 1.0, 1.0, scale)
+    assert np.isfinite(forces).all()
+    assert_forces_close(forces, reference_forces(positions, 1.0, 1.0))
+
+
+@pytest.mark.parametrize("backend", sorted(kernels.backends))
+def test_kernel_backends_match_per_pair_formula(backend):
+    positions = jittered_grid()
+    first, second = all_pairs(len(positions))
+    forces = np.zeros_like(positions)
+    kernels.load(backend).lennard_jones(positions, first, second, 1.0, 1.0, scale, None, False, forces)
+    assert_forces_close(forces, reference_forces(positions, 1.0, 1.0))
+
+
+@pytest.mark.parametrize("backend", sorted(kernels.backends))
+def test_keep_within_bounds_clamps_centres_inside_the_walls(backend):
+    positions = np.array([[-40.0, 50.0], [120.0, 250.0], [50.0, 60.0]])
+    kernels.load(backend).keep_within_bounds(positions, np.full(3, 10.0), (0, 0), (100, 200))
+    np.testing.assert_array_equal(positions, [[10.0, 50.0], [90.0, 190.0], [50.0, 60.0]])
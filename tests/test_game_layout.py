@@ -0,0 +1,31 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+pytest.importorskip("kivy")
+from game_layout import GameLayout  # noqa: E402
+
+
+def layout_stub(width, size_factor, radius):
+    """Just the attributes resize_molecules reads, with a physics queue that records what is submitted."""
+    submitted = []
+    return SimpleNamespace(size=(width, 600), size_factor=size_factor, molecule_radius=radius,
+                           molecule_radius_ratio=GameLayout.molecule_radius_ratio,
+                           apply_radius=object(), physics=SimpleNamespace(submit=lambda *args: submitted.append(args)),
+                           submitted=submitted)
+
+
+def test_molecules_are_only_resized_when_the_radius_changes():
+    width, size_factor = 1536, 0.6
+    radius = width * GameLayout.molecule_radius_ratio * size_factor
+    layout = layout_stub(width, size_factor, radius)
+    GameLayout.resize_molecules(layout)
+    assert layout.submitted == []
+
+    layout.size_factor = 0.8
+    GameLayout.resize_molecules(layout)
+    GameLayout.resize_molecules(layout)
+    assert layout.submitted == [(layout.apply_radius, width * GameLayout.molecule_radius_ratio * 0.8)]
+    assert layout.molecule_radius == layout.submitted[0][1]
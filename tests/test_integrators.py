@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import integrators
+from particle_system import ParticleSystem
+
+
+def triangle(integrator):
+    """Three molecules around the Lennard-Jones minimum, far from the walls and too small to collide."""
+    system = ParticleSystem(backend="numpy")
+    system.set_bounds((0, 0), (2000, 2000))
+    system.integrator = integrators.create(integrator)
+    positions = np.array([[1000.0, 1000.0], [1100.0, 1000.0], [1050.0, 1095.0]])
+    system.add_particles(positions, np.array([[30.0, 0.0], [-20.0, 10.0], [0.0, -40.0]]), 2.0)
+    return system
+
+
+def total_energy(system, velocity_lag=0.0):
+    """
+    Kinetic plus Lennard-Jones energy at the current positions. velocity_lag
+    is how far the velocities trail the positions (negative when ahead, as
+    leapfrog's half step), bridged with the current forces.
+    """
+    system.compute_forces(collide=False)
+    velocities = system.velocities - velocity_lag * system.forces
+    return 0.5 * np.einsum("ij,ij->", velocities, velocities) + system.lj_totals[0]
+
+
+def energy_drift(integrator, dt, duration=1.0):
+    """Largest change of total energy from the end of the first step over `duration` seconds."""
+    system = triangle(integrator)
+    lag = -0.5 * dt if integrator == "leapfrog" else 0.0
+    energies = []
+    for _ in range(int(round(duration / dt))):
+        system.step(dt)
+        energies.append(total_energy(system, lag))
+    return np.abs(np.array(energies) - energies[0]).max(), abs(energies[0])
+
+
+@pytest.mark.parametrize("integrator", ["verlet", "leapfrog", "rk4", "adaptive"])
+def test_small_steps_conserve_energy(integrator):
+    drift, energy = energy_drift(integrator, 1 / 600)
+    assert drift < 1e-3 * energy
+
+
+def test_rk4_is_more_accurate_than_verlet():
+    assert energy_drift("rk4", 1 / 600)[0] < 1e-3 * energy_drift("verlet", 1 / 600)[0]
+
+
+def test_adaptive_substeps_keep_a_large_timestep_stable():
+    adaptive, energy = energy_drift("adaptive", 1 / 6)
+    verlet, _ = energy_drift("verlet", 1 / 6)
+    assert adaptive < 0.01 * energy < verlet
+
+    system = triangle("adaptive")
+    system.step(1 / 6)
+    assert system.integrator.substeps > 1
+
+
+def test_unknown_integrator_is_rejected():
+    with pytest.raises(ValueError):
+        integrators.create("midpoint")
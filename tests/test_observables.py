@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from observables import Observables
+from particle_system import ParticleSystem
+from recorder import Recorder
+
+
+def ideal_gas(count=200, seed=0):
+    """Small molecules with no intermolecular forces, bouncing off the walls."""
+    rng = np.random.default_rng(seed)
+    system = ParticleSystem()
+    system.set_bounds((0, 0), (400, 300))
+    system.intermolecular_forces = False
+    system.add_particles(rng.uniform((10, 10), (390, 290), (count, 2)), rng.uniform(-100, 100, (count, 2)), 1.0)
+    return system
+
+
+def test_ideal_gas_wall_pressure_matches_the_virial_pressure():
+    system = ideal_gas()
+    observables = Observables(window=240)
+    for _ in range(240):
+        system.step(1 / 60)
+        observables.sample(system)
+    averages = observables.averages()
+
+    kinetic = averages["kinetic_energy"]
+    assert averages["temperature"] == pytest.approx(kinetic / system.count)
+    assert averages["total_energy"] == pytest.approx(kinetic)
+    # 2D ideal gas: P A = N k T, both from the kinetic energy and from the momentum the walls absorb
+    assert averages["virial_pressure"] == pytest.approx(kinetic / (400 * 300))
+    assert averages["wall_pressure"] == pytest.approx(averages["virial_pressure"], rel=0.1)
+
+
+def test_running_averages_cover_the_last_window_of_samples():
+    system = ideal_gas(20)
+    observables = Observables(window=4)
+    recorder = Recorder(Observables.fields, capacity=8)
+    for _ in range(10):
+        system.step(1 / 60)
+        observables.sample(system, out=recorder.next_values())
+        recorder.append_row(system.elapsed_time)
+
+    assert len(recorder) == 8
+    np.testing.assert_allclose(recorder.column("time"), np.arange(3, 11) / 60)
+    assert observables.averages()["kinetic_energy"] == pytest.approx(recorder.column("kinetic_energy")[-4:].mean())
+
+    observables.reset()
+    assert observables.averages() == {}
@@ -0,0 +1,48 @@
+import numpy as np
+
+from forces import all_pairs
+from particle_system import ParticleSystem
+
+
+def pair_set(first, second):
+    return set(zip(np.minimum(first, second).tolist(), np.maximum(first, second).tolist()))
+
+
+def test_arrays_grow_and_keep_every_particle():
+    system = ParticleSystem(capacity=2)
+    assert system.add_particle(10.0, 20.0, 1.0, 2.0, 5.0) == 0
+    positions = np.arange(20.0).reshape(10, 2)
+    assert system.add_particles(positions, -positions, 3.0) == 1
+    assert system.count == 11 and system.capacity >= 11
+    np.testing.assert_array_equal(system.positions, np.vstack(([[10.0, 20.0]], positions)))
+    np.testing.assert_array_equal(system.velocities[1:], -positions)
+    np.testing.assert_array_equal(system.radii, [5.0] + [3.0] * 10)
+
+    system.clear()
+    assert system.count == 0 and len(system.positions) == 0
+
+
+def test_rescale_maps_particles_into_the_new_box():
+    system = ParticleSystem()
+    system.set_bounds((0, 0), (100, 50))
+    system.add_particles(np.array([[25.0, 25.0], [50.0, 10.0]]), np.array([[10.0, 10.0], [0.0, -5.0]]), 1.0)
+    system.rescale((10, 10), (200, 200))
+    np.testing.assert_allclose(system.positions, [[60.0, 110.0], [110.0, 50.0]])
+    np.testing.assert_allclose(system.velocities, [[20.0, 40.0], [0.0, -20.0]])
+    assert system.bounds_pos == (10, 10) and system.bounds_size == (200, 200)
+
+
+def test_neighbour_pairs_agree_either_side_of_the_dense_limit():
+    rng = np.random.default_rng(0)
+    system = ParticleSystem()
+    system.set_bounds((0, 0), (3000, 3000))
+    count = ParticleSystem.dense_pair_limit + 50
+    system.add_particles(rng.uniform(0, 3000, (count, 2)), np.zeros((count, 2)), 5.0)
+    cutoff = system.neighbor_cutoff()
+
+    first, second = system.neighbor_pairs()
+    every_first, every_second = all_pairs(system.count)
+    offsets = system.positions[every_first] - system.positions[every_second]
+    within = np.hypot(offsets[:, 0], offsets[:, 1]) <= cutoff
+    assert pair_set(every_first[within], every_second[within]) <= pair_set(first, second)
+    assert len(first) < len(every_first)  # The cell list, not every pair
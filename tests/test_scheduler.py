@@ -0,0 +1,26 @@
+import pytest
+
+from scheduler import FixedTimestepScheduler
+
+
+def test_steps_follow_elapsed_time_and_carry_the_remainder():
+    scheduler = FixedTimestepScheduler(frame_step=0.01, substeps=2)
+    assert scheduler.advance(0.012) == 2  # Two 0.005 s steps, 0.002 s carried over
+    assert scheduler.accumulator == pytest.approx(0.002)
+    assert scheduler.advance(0.003) == 1
+    assert scheduler.time_until_next_step() == pytest.approx(0.005)
+
+
+def test_catch_up_is_clamped_and_the_backlog_dropped():
+    scheduler = FixedTimestepScheduler(frame_step=0.01, substeps=2, max_catchup_frames=4)
+    assert scheduler.advance(1.0) == 8  # A one-second hitch runs at most 4 frames of 2 substeps
+    assert scheduler.accumulator == 0.0  # ... and doesn't spiral into the following frames
+    assert scheduler.advance(0.01) == 2
+
+
+def test_time_scale_and_stopped_time():
+    scheduler = FixedTimestepScheduler(frame_step=0.01, time_scale=0.5)
+    assert scheduler.advance(0.02) == 1
+    scheduler.time_scale = 0
+    assert scheduler.advance(1.0) == 0
+    assert scheduler.time_until_next_step() is None
@@ -0,0 +1,63 @@
+import numpy as np
+
+from bond_table import BondTable
+from particle_system import ParticleSystem
+from physics_thread import StateSnapshot
+from trajectory import TrajectoryReader, TrajectoryWriter
+
+
+def moving_system(count=40, seed=0):
+    rng = np.random.default_rng(seed)
+    system = ParticleSystem(backend="numpy")
+    system.set_bounds((0, 0), (800, 600))
+    system.add_particles(rng.uniform((50, 50), (750, 550), (count, 2)), rng.uniform(-80, 80, (count, 2)), 6.0)
+    system.colors[:] = rng.uniform(0, 1, system.colors.shape)
+    return system
+
+
+def test_round_trip_with_delta_frames_and_count_changes(tmp_path):
+    path = str(tmp_path / "run.mdtraj")
+    system = moving_system()
+    bonds = BondTable()
+    recorded = []
+    with TrajectoryWriter(path, (0, 0), (800, 600), keyframe_interval=10) as writer:
+        writer.write_parameters(delta=1 / 60, speed_factor=1.0)
+        for frame in range(25):
+            if frame == 7:
+                system.add_particles(np.array([[400.0, 300.0], [420.0, 300.0]]), np.zeros((2, 2)), 6.0)
+                bonds.add(0, system.count - 1, 100.0, 2.0)
+                writer.write_bonds(bonds)
+                writer.write_parameters(delta=1 / 30)
+            system.step(1 / 60)
+            writer.write_frame(system, frame)
+            recorded.append((system.positions.copy(), system.velocities.copy(), system.colors.copy()))
+
+    reader = TrajectoryReader(path)
+    assert len(reader) == 25
+    assert reader.keyframes[:12] == [0] * 7 + [7] * 3 + [10] * 2  # A count change forces a keyframe
+    # Seek backwards and forwards, so frames decode both in order and from their keyframe
+    for frame in (3, 24, 8, 9, 15, 0):
+        state = reader.read(frame, StateSnapshot())
+        positions, velocities, colors = recorded[frame]
+        assert state.count == len(positions) == (40 if frame < 7 else 42)
+        assert state.step_count == frame
+        # Delta frames are taken against what the reader decodes, so float16 rounding doesn't accumulate
+        np.testing.assert_allclose(state.positions, positions, atol=0.05)
+        np.testing.assert_allclose(state.velocities, velocities, atol=0.5)
+        np.testing.assert_allclose(state.colors, colors, atol=0.5 / 255 + 1e-9)
+
+    assert reader.bonds_at(6) is None
+    assert list(reader.bonds_at(20)) == [(0, 41)]
+    assert reader.parameters_at(3) == {"delta": 1 / 60, "speed_factor": 1.0}
+    assert reader.parameters_at(7) == {"delta": 1 / 30, "speed_factor": 1.0}
+
+
+def test_a_truncated_final_frame_is_ignored(tmp_path):
+    path = tmp_path / "cut.mdtraj"
+    system = moving_system(10)
+    with TrajectoryWriter(str(path), (0, 0), (800, 600)) as writer:
+        for frame in range(3):
+            system.step(1 / 60)
+            writer.write_frame(system, frame)
+    path.write_bytes(path.read_bytes()[:-20])
+    assert len(TrajectoryReader(str(path))) == 2
@@ -0,0 +1,276 @@
+"""
+Recording and replay of simulation runs in a compact chunked binary file.
+
+The file starts with MAGIC, followed by chunks. Each chunk has a CHUNK header
+(4-byte tag, the index of the frame it precedes, payload length) and a
+payload padded to a multiple of 8 bytes:
+
+    HEAD  JSON: format version, recorded bounds, time between frames
+    FRAM  FRAME header (count, flags, physics step) and the particle arrays
+    BOND  bond count, then the first and second particle of every bond (int32)
+    PARM  JSON of the simulation parameters that changed
+
+A keyframe stores radii, positions and velocities as float32. With delta
+compression, the other frames store only the float16 change in positions
+and velocities since the previous frame, taken against what a reader will
+have decoded, so rounding never accumulates. Every frame carries its colours
+as RGBA bytes, so replay doesn't need the colour settings used to record it.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from bond_table import BondTable
+from physics_thread import StateSnapshot
+
+MAGIC = b"MDTRAJ\x00\x01"
+CHUNK = struct.Struct("<4sIQ")
+FRAME = struct.Struct("<IIQ")
+BOND_COUNT = struct.Struct("<I4x")
+HEADER, FRAME_TAG, BONDS, PARAMETERS = b"HEAD", b"FRAM", b"BOND", b"PARM"
+KEYFRAME = 1
+VERSION = 1
+
+
+def frame_bytes(flags):
+    """Bytes per particle of a frame's arrays, colours included."""
+    if flags & KEYFRAME:
+        return 4 + 2 * 4 + 2 * 4 + 4  # float32 radius, position and velocity, then RGBA bytes
+    return 2 * 2 + 2 * 2 + 4  # float16 position and velocity changes, then RGBA bytes
+
+
+class TrajectoryWriter:
+    """
+    Streams frames, bond changes and parameter changes to a trajectory file.
+    Bonds and parameters written between two frames apply from the later one.
+    """
+
+    def __init__(self, path, pos, size, frame_interval=1 / 60.0, delta_compressed=True, keyframe_interval=60):
+        self.file = open(path, "wb")
+        self.delta_compressed = delta_compressed
+        self.keyframe_interval = keyframe_interval  # Frames between keyframes; replay seeks from the nearest one
+        self.frames = 0
+        # The previous frame as a reader decodes it, which delta frames are taken against
+        self.radii = None
+        self.positions = None
+        self.velocities = None
+
+        self.file.write(MAGIC)
+        header = {"version": VERSION, "bounds": [*pos, *size], "frame_interval": frame_interval}
+        self.write_chunk(HEADER, json.dumps(header).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_chunk(self, tag, *payloads):
+        """Write one chunk whose payload is the concatenation of `payloads` (bytes or contiguous arrays)."""
+        length = sum(memoryview(payload).nbytes for payload in payloads)
+        padding = -length % 8
+        self.file.write(CHUNK.pack(tag, self.frames, length + padding))
+        for payload in payloads:
+            self.file.write(payload)
+        self.file.write(bytes(padding))
+
+    def write_frame(self, state, step=0, colors=None):
+        """
+        Append a frame of `state` (a ParticleSystem or StateSnapshot).
+        :param colors: (N, 4) RGBA in [0, 1] as drawn; state.colors when None.
+        """
+        radii = state.radii.astype(np.float32)
+        positions = state.positions.astype(np.float32)
+        velocities = state.velocities.astype(np.float32)
+        colors = np.clip((state.colors if colors is None else colors) * 255 + 0.5, 0, 255).astype(np.uint8)
+
+        keyframe = (not self.delta_compressed or self.frames % self.keyframe_interval == 0
+                    or self.radii is None or not np.array_equal(radii, self.radii))
+        if not keyframe:
+            position_deltas = (positions - self.positions).astype(np.float16)
+            velocity_deltas = (velocities - self.velocities).astype(np.float16)
+            # A change too large for float16 overflows to infinity; store the whole frame instead
+            keyframe = not (np.isfinite(position_deltas).all() and np.isfinite(velocity_deltas).all())
+
+        if keyframe:
+            self.write_chunk(FRAME_TAG, FRAME.pack(state.count, KEYFRAME, step), radii, positions, velocities, colors)
+            self.radii, self.positions, self.velocities = radii, positions, velocities
+        else:
+            self.write_chunk(FRAME_TAG, FRAME.pack(state.count, 0, step), position_deltas, velocity_deltas, colors)
+            self.positions += position_deltas
+            self.velocities += velocity_deltas
+        self.frames += 1
+
+    def write_bonds(self, bonds):
+        """Record the bond topology (a BondTable) from the next frame on."""
+        self.write_chunk(BONDS, BOND_COUNT.pack(len(bonds)),
+                         bonds.first.astype(np.int32), bonds.second.astype(np.int32))
+
+    def write_parameters(self, **parameters):
+        """Record changed simulation parameters (JSON-serialisable values) from the next frame on."""
+        self.write_chunk(PARAMETERS, json.dumps(parameters).encode())
+
+    def close(self):
+        self.file.close()
+
+
+class TrajectoryReader:
+    """
+    Memory-maps a trajectory file and decodes its frames on demand. Reading
+    frames in order costs one frame each; jumping decodes forward from the
+    nearest keyframe. A truncated final chunk, as left by an interrupted
+    recording, is ignored.
+    """
+
+    def __init__(self, path):
+        """:raises ValueError: If the file is empty, not a trajectory file, or has malformed frames."""
+        if os.path.getsize(path) < len(MAGIC):
+            raise ValueError(f"{path} is not a trajectory file")
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+
+        self.frame_offsets = []  # Payload offset of every frame
+        self.keyframes = []  # Index of the keyframe each frame is decoded from
+        self.bond_events = []  # (first frame, payload offset) of every bond topology
+        self.parameter_events = []  # (first frame, changed parameters)
+        self.header = {}
+        offset = len(MAGIC)
+        while offset + CHUNK.size <= len(self.data):
+            tag, frame, length = CHUNK.unpack_from(self.data, offset)
+            payload = offset + CHUNK.size
+            if payload + length > len(self.data):
+                break
+            if tag == HEADER:
+                self.header = self.json(payload, length)
+            elif tag == FRAME_TAG:
+                if length < FRAME.size:
+                    raise ValueError(f"{path} has a frame chunk too short for its header")
+                count, flags, _ = FRAME.unpack_from(self.data, payload)
+                if not flags & KEYFRAME and not self.keyframes:
+                    raise ValueError(f"{path} starts with a delta frame, which has nothing to decode against")
+                if FRAME.size + count * frame_bytes(flags) > length:
+                    raise ValueError(f"{path} has a frame chunk too short for its {count} particles")
+                self.keyframes.append(frame if flags & KEYFRAME else self.keyframes[-1])
+                self.frame_offsets.append(payload)
+            elif tag == BONDS:
+                self.bond_events.append((frame, payload))
+            elif tag == PARAMETERS:
+                self.parameter_events.append((frame, self.json(payload, length)))
+            offset = payload + length
+
+        self.bounds = self.header.get("bounds", [0, 0, 1, 1])
+        self.frame_interval = self.header.get("frame_interval", 1 / 60.0)
+        self.decoded = -1  # Frame held in the decode buffers below
+        self.count = 0
+        self.step = 0
+        self.radii = np.zeros(0, dtype=np.float32)
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        self.colors = np.zeros((0, 4), dtype=np.uint8)
+        self.bond_cache = {}
+
+    def __len__(self):
+        return len(self.frame_offsets)
+
+    def json(self, offset, length):
+        return json.loads(bytes(self.data[offset:offset + length]).rstrip(b"\0"))
+
+    def array(self, offset, dtype, shape):
+        """View of the mapped file at `offset`, and the offset just past it."""
+        end = offset + int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return self.data[offset:end].view(dtype).reshape(shape), end
+
+    def decode(self, index):
+        """Bring the decode buffers to frame `index`."""
+        start = self.keyframes[index]
+        if start <= self.decoded < index:
+            start = self.decoded + 1
+        for frame in range(start, index + 1):
+            offset = self.frame_offsets[frame]
+            count, flags, self.step = FRAME.unpack_from(self.data, offset)
+            offset += FRAME.size
+            if flags & KEYFRAME:
+                self.radii, offset = self.array(offset, np.float32, count)
+                positions, offset = self.array(offset, np.float32, (count, 2))
+                velocities, offset = self.array(offset, np.float32, (count, 2))
+                self.positions = positions.copy()  # Later delta frames are added onto these
+                self.velocities = velocities.copy()
+            else:
+                position_deltas, offset = self.array(offset, np.float16, (count, 2))
+                velocity_deltas, offset = self.array(offset, np.float16, (count, 2))
+                self.positions += position_deltas
+                self.velocities += velocity_deltas
+            self.colors, _ = self.array(offset, np.uint8, (count, 4))
+            self.count = count
+        self.decoded = index
+
+    def read(self, index, out, scale=1.0, offset=(0, 0)):
+        """Decode frame `index` into the StateSnapshot `out`, mapping recorded positions through scale and offset."""
+        self.decode(index)
+        out.count = self.count
+        out.step_count = self.step
+        out.positions = self.positions * scale + np.asarray(offset)
+        out.velocities = self.velocities * scale
+        out.radii = self.radii * scale
+        out.colors = self.colors / 255.0
+        if out.forces.shape != out.positions.shape:
+            out.forces = np.zeros_like(out.positions)  # Forces aren't recorded
+        return out
+
+    def bonds_at(self, index):
+        """BondTable in effect at frame `index`, or None if no bonds were recorded before it."""
+        events = [event for event in self.bond_events if event[0] <= index]
+        if not events:
+            return None
+        payload = events[-1][1]
+        if payload not in self.bond_cache:
+            (count,) = BOND_COUNT.unpack_from(self.data, payload)
+            first, end = self.array(payload + BOND_COUNT.size, np.int32, count)
+            second, _ = self.array(end, np.int32, count)
+            bonds = BondTable(max(count, 1))
+            for particle1, particle2 in zip(first.tolist(), second.tolist()):
+                bonds.add(particle1, particle2, 0.0, 0.0)
+            self.bond_cache[payload] = bonds
+        return self.bond_cache[payload]
+
+    def parameters_at(self, index):
+        """Every parameter recorded up to frame `index`, latest values winning."""
+        parameters = {}
+        for frame, changed in self.parameter_events:
+            if frame <= index:
+                parameters.update(changed)
+        return parameters
+
+
+class Replay:
+    """
+    Plays a trajectory frame by frame into a StateSnapshot, looping at the
+    end, with the recorded box scaled and centred to fit a display area.
+    No physics runs; each frame is decoded straight from the mapped file.
+    """
+
+    def __init__(self, path, pos, size):
+        self.reader = TrajectoryReader(path)
+        self.state = StateSnapshot()
+        self.frame = -1
+        self.fit(pos, size)
+
+    def fit(self, pos, size):
+        x, y, width, height = self.reader.bounds
+        self.scale = min(size[0] / width, size[1] / height)
+        self.offset = (pos[0] + (size[0] - self.scale * width) / 2 - self.scale * x,
+                       pos[1] + (size[1] - self.scale * height) / 2 - self.scale * y)
+
+    @property
+    def bonds(self):
+        return self.reader.bonds_at(self.frame)
+
+    def advance(self):
+        """Move to the next frame, wrapping around; return the state, or None for an empty trajectory."""
+        if not len(self.reader):
+            return None
+        self.frame = (self.frame + 1) % len(self.reader)
+        return self.reader.read(self.frame, self.state, self.scale, self.offset)
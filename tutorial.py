@@ -315,8 +315,7 @@ class GameScreen(Screen):
 
     def clear_game_area(self):
         """Clear the game area of all molecules and bonds."""
-        self.game_area.clear_widgets()
-        self.game_area.molecules.clear()
+        self.game_area.clear_molecules()
         self.game_area.clear_bonds()
 
     # def create_forces_switch(self):